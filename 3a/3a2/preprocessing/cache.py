@@ -0,0 +1,193 @@
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Iterable, Optional, Tuple
+import pandas as pd
+import numpy as np
+
+# Results are stored as data/output/<name>-<key>.pkl, where the key is a
+# hash of the input data and the parameters, so a result is reused for as
+# long as neither changes.  Once the stored results exceed MAX_BYTES the
+# least recently used ones are removed.
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "output")
+MAX_BYTES = 1024 ** 3
+
+# Bump when a cached function changes its results for the same inputs
+VERSION = 3
+
+enabled = True
+
+logger = logging.getLogger(__name__)
+
+
+def disable() -> None:
+    # For --no-cache: every call computes its result and nothing is stored
+    global enabled
+    enabled = False
+
+
+def digest(value: Any) -> str:
+    # Content hash of a function argument
+    h = hashlib.sha256()
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(b"pandas")
+        names = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        h.update(repr((value.shape, names, [str(t) for t in np.atleast_1d(value.dtypes)])).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(b"ndarray")
+        h.update(repr((value.shape, str(value.dtype))).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(type(value).__name__.encode())
+        for item in value:
+            h.update(digest(item).encode())
+    else:
+        h.update(repr(value).encode())
+
+    return h.hexdigest()
+
+
+def file_digest(path: str, block_size: int = 2 ** 20) -> str:
+    # Content hash of a file, read in blocks
+    h = hashlib.sha256()
+    with open(path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(block_size), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def _path(name: str, key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{name}-{key}.pkl")
+
+
+def load(name: str, key: str) -> Tuple[bool, Any]:
+    path = _path(name, key)
+    try:
+        with open(path, "rb") as file_obj:
+            value = pickle.load(file_obj)
+    except OSError:
+        logger.info("cache miss %s %s", name, key[:12])
+        return False, None
+    except Exception:
+        # Unreadable, e.g. written under other pandas/NumPy versions: the
+        # entry is removed and the result recomputed
+        logger.info("cache miss %s %s (unreadable entry removed)", name, key[:12])
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return False, None
+
+    # Mark as recently used for the eviction
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    logger.info("cache hit %s %s", name, key[:12])
+
+    return True, value
+
+
+def store(name: str, key: str, value: Any) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Written to a temporary file first so readers never see a partial result
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as file_obj:
+        pickle.dump(value, file_obj, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, _path(name, key))
+
+    evict()
+
+
+def evict(max_bytes: Optional[int] = None) -> None:
+    # Removes the least recently used results until they fit in max_bytes
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".pkl")]
+    except OSError:
+        return
+
+    # Entries removed by another process meanwhile are skipped
+    stats = []
+    for e in entries:
+        try:
+            stats.append((e.stat().st_mtime, e.stat().st_size, e))
+        except FileNotFoundError:
+            pass
+
+    stats.sort(key=lambda s: s[0])
+    total = sum(size for _, size, _ in stats)
+    for _, size, e in stats:
+        if total <= max_bytes:
+            break
+        total -= size
+        try:
+            os.remove(e.path)
+        except FileNotFoundError:
+            continue
+        logger.info("cache evict %s", e.name)
+
+
+def memoize(name: str, parts: Iterable[str], compute: Callable[[], Any]) -> Any:
+    # Returns the stored result for the key parts, or computes and stores it
+    if not enabled:
+        return compute()
+
+    key = hashlib.sha256(repr((VERSION, name, list(parts))).encode()).hexdigest()
+    hit, value = load(name, key)
+    if hit:
+        return value
+
+    value = compute()
+    store(name, key, value)
+
+    return value
+
+
+def cached(name: str, ignore: Iterable[str] = (), global_random: Optional[Callable[[dict], bool]] = None):
+    # Decorator caching a function's result on the content of its arguments.
+    # ignore names arguments that do not change the result (e.g. n_jobs).
+    # global_random(arguments) tells whether a call draws from the global
+    # NumPy generator: its state is then part of the key, and the state after
+    # the call is stored and restored on a hit, so callers relying on
+    # np.random.seed see the same results and the same generator state.
+    ignore = set(ignore)
+
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            parts = [(arg, digest(value)) for arg, value in bound.arguments.items() if arg not in ignore]
+
+            uses_random = global_random is not None and global_random(bound.arguments)
+            if uses_random:
+                parts.append(("np.random", digest(list(np.random.get_state()))))
+
+            def compute():
+                result = fn(*args, **kwargs)
+                return result, np.random.get_state() if uses_random else None
+
+            result, state = memoize(name, parts, compute)
+            if state is not None:
+                np.random.set_state(state)
+
+            return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,98 @@
+import json
+import os
+from typing import Tuple
+import pandas as pd
+import numpy as np
+
+# Binary version of the data/labels split: the features as one float32
+# .npy matrix (labelled rows first, in the order of data.csv), the labels
+# as the smallest integer type that holds them and a small JSON manifest
+# with the labelled and unlabelled row ranges.  np.load memory-maps the
+# .npy files, so loading takes milliseconds and parallel workers share the
+# pages of one file instead of each holding its own DataFrame.
+
+FEATURES_FILE = "features.npy"
+LABELS_FILE = "labels.npy"
+MANIFEST_FILE = "manifest.json"
+
+FORMAT_VERSION = 1
+
+
+def label_dtype(labels: np.ndarray) -> np.dtype:
+    # Smallest integer type holding every label.  Other labels (e.g. a
+    # float column with missing values) are rejected rather than narrowed.
+    if not np.issubdtype(labels.dtype, np.integer):
+        raise ValueError(f"Labels must be integers, got {labels.dtype}")
+    if len(labels) == 0:
+        return np.dtype(np.uint8)
+    return np.result_type(np.min_scalar_type(labels.min()), np.min_scalar_type(labels.max()))
+
+
+def _save(path: str, values: np.ndarray) -> None:
+    # Written to a temporary file first so readers never see a partial file
+    with open(path + ".tmp", "wb") as file_obj:
+        np.save(file_obj, values)
+    os.replace(path + ".tmp", path)
+
+
+def write_dataset(data_labelled: pd.DataFrame, data_unlabelled: pd.DataFrame, labels: pd.DataFrame,
+                  directory: str) -> dict:
+    # Writes the output of split_data and the labels to directory and
+    # returns the manifest
+    os.makedirs(directory, exist_ok=True)
+
+    features = np.concatenate([data_labelled.to_numpy(dtype=np.float32),
+                               data_unlabelled.to_numpy(dtype=np.float32)])
+    label_values = np.asarray(labels.iloc[:, 0] if isinstance(labels, pd.DataFrame) else labels)
+    label_values = label_values.astype(label_dtype(label_values))
+
+    num_labelled = len(data_labelled.index)
+    manifest = {
+        "version": FORMAT_VERSION,
+        "rows": int(features.shape[0]),
+        "features": int(features.shape[1]),
+        "features_dtype": str(features.dtype),
+        "labels_dtype": str(label_values.dtype),
+        "labelled": [0, num_labelled],
+        "unlabelled": [num_labelled, int(features.shape[0])],
+    }
+
+    _save(os.path.join(directory, FEATURES_FILE), features)
+    _save(os.path.join(directory, LABELS_FILE), label_values)
+
+    # The manifest goes last, a directory with a manifest is complete
+    with open(os.path.join(directory, MANIFEST_FILE + ".tmp"), "w") as file_obj:
+        json.dump(manifest, file_obj, indent=2)
+    os.replace(os.path.join(directory, MANIFEST_FILE + ".tmp"), os.path.join(directory, MANIFEST_FILE))
+
+    return manifest
+
+
+def read_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST_FILE)) as file_obj:
+        manifest = json.load(file_obj)
+
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset version {manifest.get('version')} in {directory}")
+
+    return manifest
+
+
+def load_dataset(directory: str, mmap_mode: str = "r") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Labelled features, unlabelled features and labels.  With the default
+    # mmap_mode these are read-only views of the memory-mapped files, no
+    # data is read until it is used; mmap_mode=None reads them into memory.
+    manifest = read_manifest(directory)
+
+    features = np.load(os.path.join(directory, FEATURES_FILE), mmap_mode=mmap_mode)
+    labels = np.load(os.path.join(directory, LABELS_FILE), mmap_mode=mmap_mode)
+
+    if features.shape != (manifest["rows"], manifest["features"]) or len(labels) != manifest["labelled"][1]:
+        raise ValueError(f"Dataset files in {directory} do not match its manifest")
+
+    start, stop = manifest["labelled"]
+    labelled = features[start:stop]
+    start, stop = manifest["unlabelled"]
+    unlabelled = features[start:stop]
+
+    return labelled, unlabelled, labels
@@ -1,41 +1,121 @@
 import argparse
-from typing import Tuple
+import logging
+from typing import Iterator, Tuple
 import pandas as pd
 import numpy as np
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
+try:
+    from preprocessing import cache
+except ImportError:
+    # Run as a script, e.g. python preprocessing/pca.py
+    import cache
 
 
+logger = logging.getLogger(__name__)
+
+
+def num_components(explained_variance_ratio: np.ndarray, var_explained: float) -> int:
+    # Number of components kept for var_explained.  This is the index of
+    # the first component at which the cumulative explained variance
+    # reaches var_explained, so one less than the number of components
+    # that explain it: the off-by-one of the original script, kept so its
+    # output does not change.  At least one component is kept.
+    reached = np.cumsum(explained_variance_ratio) >= var_explained
+    if not reached.any():
+        raise ValueError(f"The components explain less than {var_explained} of the variance")
+
+    return max(int(np.argmax(reached)), 1)
+
+
+@cache.cached("transform_data_pca")
 def transform_data_pca(data: pd.DataFrame, var_explained: float) -> Tuple[pd.DataFrame, int]:
     pca = PCA(n_components=data.shape[1])
-    pca.fit(data)
+    transformed = pca.fit_transform(data)
+
+    num_pcs = num_components(pca.explained_variance_ratio_, var_explained)
+
+    # The leading components of the full fit are the ones a fit with
+    # num_pcs components would find, so no second fit is needed
+    return pd.DataFrame(transformed[:, :num_pcs]), num_pcs
 
-    cum_explained = np.cumsum(pca.explained_variance_ratio_)
-    num_pcs = np.argmax(cum_explained>=var_explained)
 
-    pca = PCA(n_components=num_pcs)
-    pca.fit(data)
+def _read_chunks(data_file: str, chunk_size: int, min_rows: int = 1) -> Iterator[np.ndarray]:
+    # Yields the rows of a headerless CSV file in chunks of at least
+    # min_rows rows (a short last chunk is joined to the one before it)
+    pending = None
+    for chunk in pd.read_csv(data_file, header=None, chunksize=chunk_size):
+        values = chunk.to_numpy(dtype=np.float64)
+        if pending is not None and len(values) < min_rows:
+            pending = np.vstack([pending, values])
+            continue
+        if pending is not None:
+            yield pending
+        pending = values
 
-    return pd.DataFrame(pca.transform(data)), num_pcs
+    if pending is not None:
+        yield pending
 
 
+def transform_file_pca(data_file: str, output_file: str, var_explained: float,
+                       chunk_size: int = 10000) -> int:
+    # Out-of-core version of transform_data_pca: an IncrementalPCA is fitted
+    # over the file chunk by chunk, the number of components is chosen from
+    # its explained variance and the transformed data is written chunk by
+    # chunk, in the same CSV layout as transform_data_pca's output.
+    num_features = pd.read_csv(data_file, header=None, nrows=1).shape[1]
+    n_components = min(num_features, chunk_size)
+
+    ipca = None
+    for values in _read_chunks(data_file, chunk_size, n_components):
+        if ipca is None:
+            # A file with fewer rows than n_components is a single chunk
+            ipca = IncrementalPCA(n_components=min(n_components, len(values)))
+        ipca.partial_fit(values)
+        logger.info("Fitted %d rows, %.3f of the variance explained",
+                    ipca.n_samples_seen_, ipca.explained_variance_ratio_.sum())
+
+    if ipca is None:
+        raise ValueError(f"{data_file} has no data rows")
+
+    num_pcs = num_components(ipca.explained_variance_ratio_, var_explained)
+
+    start = 0
+    for values in _read_chunks(data_file, chunk_size):
+        transformed = pd.DataFrame(ipca.transform(values)[:, :num_pcs],
+                                   index=pd.RangeIndex(start, start + len(values)))
+        transformed.to_csv(output_file, mode='w' if start == 0 else 'a', header=start == 0)
+        start += len(values)
+
+    return num_pcs
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Creates a transformation of the data using PCA that explains a "
                                                  "given percentage of variance")
     parser.add_argument("-df", "--data_file", help="The location of the data file for which we fit the PCA")
-    parser.add_argument("-ve", "--variance_explained", help="The required level of variance explained")
+    parser.add_argument("-ve", "--variance_explained", type=float, help="The required level of variance explained")
     parser.add_argument("-of", "--output_file", help="The name of the output file for the PCA-transformed data")
+    parser.add_argument("-cs", "--chunk_size", type=int, help="Read, fit and write the data this many rows at a time "
+                                                              "(incremental PCA), for data larger than memory")
+    parser.add_argument("--no-cache", action="store_true", help="Refit the PCA even if the result is cached")
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.no_cache:
+        cache.disable()
+
     DATA_FILE = args.data_file if args.data_file else "data.csv"
     VAR_EXPL = args.variance_explained if args.variance_explained else 0.95
     OUTPUT_FILE = args.output_file if args.output_file else "pca_reduced.csv"
 
-    df = pd.read_csv(DATA_FILE, header=None)
+    if args.chunk_size:
+        num_pcs = transform_file_pca(DATA_FILE, OUTPUT_FILE, VAR_EXPL, args.chunk_size)
+        print(f"Num PCs kept: {num_pcs}")
+    else:
+        df = pd.read_csv(DATA_FILE, header=None)
 
-    transformed_data, num_pcs = transform_data_pca(df, VAR_EXPL)
-    print(f"Num PCs kept: {num_pcs}")
+        transformed_data, num_pcs = transform_data_pca(df, VAR_EXPL)
+        print(f"Num PCs kept: {num_pcs}")
 
-    transformed_data.to_csv(OUTPUT_FILE)
-    
\ No newline at end of file
+        transformed_data.to_csv(OUTPUT_FILE)
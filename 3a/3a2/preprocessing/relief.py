@@ -1,64 +1,274 @@
 import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import euclidean_distances
+from scipy.spatial import cKDTree
+from sklearn.neighbors import BallTree
+try:
+    from preprocessing import cache
+except ImportError:
+    # Run as a script, e.g. python preprocessing/relief.py
+    import cache
+
+# Memory allowed for the pairwise differences computed at once
+BLOCK_BYTES = 64 * 2 ** 20
+
+# Sampled instances per task.  Fixed, so the partial weights are summed in
+# the same order whatever the number of processes.
+CHUNK_SIZE = 1024
+
+INDEXES = ("brute", "kdtree", "balltree")
+
+# (samples, sample labels, class priors, per class trees) of this process,
+# set by _init_state
+_state = None
+
+
+def _as_arrays(data, labels) -> Tuple[np.ndarray, np.ndarray]:
+    # Contiguous float features and a flat integer label per row, from
+    # DataFrames, Series or arrays
+    X = np.ascontiguousarray(np.asarray(data, dtype=np.float64))
+    y = np.asarray(labels).reshape(len(labels), -1)[:, 0].astype(np.int64)
+
+    return X, y
+
+
+def distance_blocks(X: np.ndarray, rows: Optional[np.ndarray] = None,
+                    block_bytes: int = BLOCK_BYTES) -> Iterator[Tuple[int, int, np.ndarray]]:
+    # Yields (start, stop, D) where D holds the Euclidean distances of rows
+    # rows[start:stop] (all rows by default) to every row, with a row's
+    # distance to itself set to inf.  Differences are taken explicitly
+    # rather than through the dot product expansion so equal points get
+    # exactly equal distances.
+    n, p = X.shape
+    rows = np.arange(n) if rows is None else np.asarray(rows)
+    block = max(1, block_bytes // max(n * p * X.itemsize, 1))
+
+    for start in range(0, len(rows), block):
+        stop = min(start + block, len(rows))
+        diff = X[rows[start:stop], np.newaxis, :] - X[np.newaxis, :, :]
+        D = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+        D[np.arange(stop - start), rows[start:stop]] = np.inf
+        yield start, stop, D
+
+
+def _masked_argmin(D: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # Per row the first column of smallest distance among the masked ones,
+    # -1 if there is none
+    masked = np.where(mask, D, np.inf)
+    idx = np.argmin(masked, axis=1)
+    idx[np.isinf(masked[np.arange(len(idx)), idx])] = -1
+
+    return idx
+
+
+def _masked_k_smallest(D: np.ndarray, mask: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Per row the k columns of smallest distance among the masked ones,
+    # nearest first, and their distances, padded with -1 / inf
+    masked = np.where(mask, D, np.inf)
+    k = min(k, D.shape[1])
+    idx = np.argsort(masked, axis=1, kind='stable')[:, :k]
+    dist = np.take_along_axis(masked, idx, axis=1)
+    idx[np.isinf(dist)] = -1
+
+    return idx, dist
 
 
 def find_closest_point(data: pd.DataFrame, labels: pd.DataFrame, current_index: int, matching: bool) -> int:
+    X, y = _as_arrays(data, labels)
+
+    D = np.linalg.norm(X - X[current_index], axis=1)
+    D[current_index] = np.inf
+    mask = y == y[current_index] if matching else y != y[current_index]
+
+    return int(_masked_argmin(D[np.newaxis, :], mask[np.newaxis, :])[0])
+
+
+def nearest_hits_misses(X: np.ndarray, y: np.ndarray, rows: Optional[np.ndarray] = None,
+                        block_bytes: int = BLOCK_BYTES) -> Tuple[np.ndarray, np.ndarray]:
+    # Index of the nearest point of the same class (hit) and of a different
+    # class (miss) of every row (or of the given rows), -1 if there is none
+    rows = np.arange(len(X)) if rows is None else np.asarray(rows)
+    hits = np.empty(len(rows), dtype=np.int64)
+    misses = np.empty(len(rows), dtype=np.int64)
+
+    for start, stop, D in distance_blocks(X, rows, block_bytes):
+        same = y[rows[start:stop], np.newaxis] == y[np.newaxis, :]
+        hits[start:stop] = _masked_argmin(D, same)
+        misses[start:stop] = _masked_argmin(D, ~same)
+
+    return hits, misses
+
+
+def build_class_indexes(X: np.ndarray, y: np.ndarray, index: str) -> Dict[int, Tuple[object, np.ndarray]]:
+    # One spatial index per class over the rows of that class, with the
+    # rows it holds.  A KD-tree suits a few dozen dimensions, a ball tree
+    # degrades more gracefully in higher dimensions.
+    indexes = {}
+    for c in np.unique(y).tolist():
+        members = np.flatnonzero(y == c)
+        tree = cKDTree(X[members]) if index == "kdtree" else BallTree(X[members])
+        indexes[c] = (tree, members)
+
+    return indexes
+
 
-    def update_closest(old_dist: float, old_idx: int, new_dist: float, new_idx: int) -> [float, int]:
-        if new_dist < old_dist:
-            return new_dist, new_idx
-        else:
-            return old_dist, old_idx
+def _query_class(entry: Tuple[object, np.ndarray], points: np.ndarray, rows: np.ndarray,
+                 k: int) -> Tuple[np.ndarray, np.ndarray]:
+    # k nearest rows of one class to each point, skipping the point's own
+    # row, and their distances, padded with -1 / inf
+    tree, members = entry
+    kq = min(k + 1, len(members))
 
-    current_label = int(labels.iloc[current_index])
+    dist, pos = tree.query(points, k=kq)
+    dist = dist.reshape(len(points), kq)
+    idx = members[pos.reshape(len(points), kq)]
 
-    dist = np.inf
-    closest_point = -1
+    # Drop each point's own row (at most one entry), keep the first k
+    own = idx == rows[:, np.newaxis]
+    order = np.argsort(own, axis=1, kind='stable')[:, :k]
+    idx = np.take_along_axis(idx, order, axis=1)
+    dist = np.take_along_axis(np.where(own, np.inf, dist), order, axis=1)
+    idx[np.isinf(dist)] = -1
 
-    for idx in range(data.shape[0]):
-        if idx == current_index:
-            continue
+    if idx.shape[1] < k:
+        pad = k - idx.shape[1]
+        idx = np.hstack([idx, np.full((len(points), pad), -1)])
+        dist = np.hstack([dist, np.full((len(points), pad), np.inf)])
 
-        if matching and current_label == int(labels.iloc[idx]):
-            d = np.linalg.norm(data.iloc[idx, :] - data.iloc[current_index, :])
-            dist, closest_point = update_closest(dist, closest_point, d, idx)
+    return idx, dist
 
-        elif not matching and current_label != int(labels.iloc[idx]):
-            d = np.linalg.norm(data.iloc[idx, :] - data.iloc[current_index, :])
-            dist, closest_point = update_closest(dist, closest_point, d, idx)
 
-    return closest_point
+def _init_state(samples: np.ndarray, sample_labels: np.ndarray, index: str) -> None:
+    global _state
 
+    classes, counts = np.unique(sample_labels, return_counts=True)
+    priors = dict(zip(classes.tolist(), (counts / len(sample_labels)).tolist()))
+    indexes = build_class_indexes(samples, sample_labels, index) if index != "brute" else None
 
-def relief(data: pd.DataFrame, labels: pd.DataFrame, number_samples: int) -> list:
+    _state = (samples, sample_labels, priors, indexes)
 
+
+def _relief_chunk(rows: np.ndarray) -> np.ndarray:
+    # Sum over the rows of |x - nearest miss| - |x - nearest hit|
+    samples, sample_labels, priors, indexes = _state
+
+    if indexes is None:
+        hits, misses = nearest_hits_misses(samples, sample_labels, rows)
+    else:
+        points = samples[rows]
+        hits = np.full(len(rows), -1)
+        misses = np.full(len(rows), -1)
+        miss_dist = np.full(len(rows), np.inf)
+        for c, entry in indexes.items():
+            idx, dist = _query_class(entry, points, rows, 1)
+            own = sample_labels[rows] == c
+            hits[own] = idx[own, 0]
+            closer = ~own & (dist[:, 0] < miss_dist)
+            misses[closer] = idx[closer, 0]
+            miss_dist[closer] = dist[closer, 0]
+
+    # A missing hit or miss (-1) is the last sample, as it always has been
+    block = samples[rows]
+    return (np.abs(block - samples[misses]) - np.abs(block - samples[hits])).sum(axis=0)
+
+
+def _relieff_chunk(rows: np.ndarray, k: int) -> np.ndarray:
+    # Sum over the rows of the prior weighted mean distance to the k nearest
+    # misses of every other class minus the mean distance to the k nearest
+    # hits
+    samples, sample_labels, priors, indexes = _state
+    block = samples[rows]
+    block_labels = sample_labels[rows]
+    own_prior = np.array([priors[c] for c in block_labels.tolist()])
+
+    if indexes is None:
+        neighbours = {c: np.empty((len(rows), min(k, len(samples))), dtype=np.int64) for c in priors}
+        for start, stop, D in distance_blocks(samples, rows):
+            for c in priors:
+                neighbours[c][start:stop] = _masked_k_smallest(D, (sample_labels == c)[np.newaxis, :], k)[0]
+    else:
+        neighbours = {c: _query_class(entry, block, rows, k)[0] for c, entry in indexes.items()}
+
+    w = np.zeros(samples.shape[1])
+    for c, idx in neighbours.items():
+        found = idx >= 0
+        diffs = np.abs(block[:, np.newaxis, :] - samples[idx]) * found[:, :, np.newaxis]
+        mean_diff = diffs.sum(axis=1) / np.maximum(found.sum(axis=1), 1)[:, np.newaxis]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.where(block_labels == c, -1.0, priors[c] / (1.0 - own_prior))
+        w += (factor[:, np.newaxis] * mean_diff).sum(axis=0)
+
+    return w
+
+
+def _sample(data, labels, number_samples: int, seed: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
     assert data.shape[0] >= number_samples
     assert labels.shape[0] >= number_samples
-    assert labels.shape[1] == 1
+    assert labels.ndim == 1 or labels.shape[1] == 1
+    assert seed is None or isinstance(seed, (int, np.integer))
 
-    w = [0] * data.shape[1]
+    X, y = _as_arrays(data, labels)
 
-    selected_indices = np.random.permutation(range(number_samples))
+    # Without a seed the global NumPy generator is used, so np.random.seed
+    # gives the same samples as before
+    random = np.random if seed is None else np.random.RandomState(seed)
+    selected_indices = random.permutation(range(number_samples))
 
-    samples = data.iloc[selected_indices, :]
-    sample_labels = labels.iloc[selected_indices]
+    return X[selected_indices], y[selected_indices]
 
-    feature_ranges = [max(samples.iloc[:, i]) - min(samples.iloc[:, i]) for i in range(data.shape[1])]
 
-    for idx in range(number_samples):
+def _sum_chunks(samples: np.ndarray, sample_labels: np.ndarray, index: str, n_jobs: int, fn, *args) -> np.ndarray:
+    # Runs fn over fixed size chunks of the samples, in n_jobs processes,
+    # and sums the partial weights in chunk order
+    if index not in INDEXES:
+        raise ValueError(f"Unknown index '{index}', expected one of {', '.join(INDEXES)}")
 
-        nearest_hit = samples.iloc[find_closest_point(samples, sample_labels, idx, True), :]
-        nearest_miss = samples.iloc[find_closest_point(samples, sample_labels, idx, False), :]
+    chunks = [np.arange(start, min(start + CHUNK_SIZE, len(samples))) for start in range(0, len(samples), CHUNK_SIZE)]
 
-        sample = samples.iloc[idx, :]
-        # perform update
-        for f_idx in range(data.shape[1]):
-            w[f_idx] = w[f_idx] - (abs(sample[f_idx] - nearest_hit[f_idx])/feature_ranges[f_idx]/number_samples) + \
-                              (abs(sample[f_idx] - nearest_miss[f_idx])/feature_ranges[f_idx]/number_samples)
+    if n_jobs == 1 or len(chunks) == 1:
+        _init_state(samples, sample_labels, index)
+        partials = [fn(rows, *args) for rows in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs if n_jobs > 0 else None, initializer=_init_state,
+                                 initargs=(samples, sample_labels, index)) as pool:
+            partials = list(pool.map(fn, chunks, *([a] * len(chunks) for a in args)))
 
-    return w
+    return np.sum(partials, axis=0) if partials else np.zeros(samples.shape[1])
+
+
+@cache.cached("relief", ignore=("n_jobs",), global_random=lambda args: args["seed"] is None)
+def relief(data: pd.DataFrame, labels: pd.DataFrame, number_samples: int, seed: Optional[int] = None,
+           n_jobs: int = 1, index: str = "brute") -> list:
+    # index is "brute", "kdtree" or "balltree".  The trees return the same
+    # neighbours as brute force up to the choice among equidistant points.
+    # n_jobs processes share the sampled instances, -1 uses every CPU.
+
+    samples, sample_labels = _sample(data, labels, number_samples, seed)
+    feature_ranges = samples.max(axis=0) - samples.min(axis=0)
+
+    w = _sum_chunks(samples, sample_labels, index, n_jobs, _relief_chunk)
+
+    # perform update
+    return list(w / feature_ranges / number_samples)
+
+
+@cache.cached("relieff", ignore=("n_jobs",), global_random=lambda args: args["seed"] is None)
+def relieff(data: pd.DataFrame, labels: pd.DataFrame, number_samples: int, k: int = 10, seed: Optional[int] = None,
+            n_jobs: int = 1, index: str = "brute") -> list:
+    # ReliefF (Kononenko, 1994): the k nearest hits are averaged and the k
+    # nearest misses of every other class are averaged and weighted by the
+    # prior of that class, so any number of classes is supported.
+
+    samples, sample_labels = _sample(data, labels, number_samples, seed)
+    feature_ranges = samples.max(axis=0) - samples.min(axis=0)
+
+    w = _sum_chunks(samples, sample_labels, index, n_jobs, _relieff_chunk, k)
+
+    return list(w / feature_ranges / number_samples)
 
 
 if __name__ == "__main__":
@@ -66,13 +276,24 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Performs feature selection using Relief")
     parser.add_argument("-df", "--data_file", help="The location of the data file")
     parser.add_argument("-lf", "--labels-file", help="The location of the label file")
-    parser.add_argument("-n", "--number_of_samples", help="The number of samples to take from the data "
-                                                          "to perform relief on. Must be smaller than or equal to "
-                                                          "min(#datapoints, #labels)")
+    parser.add_argument("-n", "--number_of_samples", type=int, help="The number of samples to take from the data "
+                                                                    "to perform relief on. Must be smaller than or "
+                                                                    "equal to min(#datapoints, #labels)")
     parser.add_argument("-of", "--output_file", help="The name of the output file for the feature weights")
+    parser.add_argument("-k", "--neighbours", type=int, help="Use ReliefF with this many nearest hits and misses "
+                                                             "per class instead of Relief")
+    parser.add_argument("--index", choices=INDEXES, default="brute",
+                        help="Nearest neighbour search: brute force or one KD-tree / ball tree per class")
+    parser.add_argument("--n-jobs", type=int, default=1, help="Number of processes, -1 for one per CPU")
+    parser.add_argument("--seed", type=int, help="Seed for sampling the instances, for reproducible runs")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute the weights even if they are cached")
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.no_cache:
+        cache.disable()
+
     DATA_FILE = args.data_file if args.data_file else "data.csv"
     LABELS_FILE = args.labels_file if args.labels_file else "labels.csv"
     OUTPUT_FILE = args.output_file if args.output_file else "relief_weights.csv"
@@ -82,7 +303,9 @@ if __name__ == "__main__":
 
     N_SAMPLES = args.number_of_samples if args.number_of_samples else min(data.shape[0], labels.shape[0])
 
-    print("Performing Relief -- please be patient!")
-    res = pd.DataFrame(relief(data, labels, N_SAMPLES), columns=["weights"])
+    if args.neighbours:
+        weights = relieff(data, labels, N_SAMPLES, args.neighbours, args.seed, args.n_jobs, args.index)
+    else:
+        weights = relief(data, labels, N_SAMPLES, args.seed, args.n_jobs, args.index)
+    res = pd.DataFrame(weights, columns=["weights"])
     res.to_csv(OUTPUT_FILE)
-
@@ -1,5 +1,27 @@
 import argparse
+import logging
+from typing import Tuple
 import pandas as pd
+try:
+    from preprocessing import cache, dataset
+except ImportError:
+    # Run as a script, e.g. python preprocessing/split_data.py
+    import cache
+    import dataset
+
+
+def split_data(data_file: str, labels_file: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    # Data points with and without labels, and the labels.  The parsed
+    # frames are cached on the content of both files, so unchanged files
+    # are not parsed again.
+    def split():
+        data = pd.read_csv(data_file, header=None)
+        labels = pd.read_csv(labels_file, header=None)
+
+        return data[:len(labels.index)], data[len(labels.index):], labels
+
+    return cache.memoize("split_data", [cache.file_digest(data_file), cache.file_digest(labels_file)], split)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="This program splits up the data into a file that has all the "
@@ -8,21 +30,23 @@ if __name__ == "__main__":
 
     parser.add_argument("-df", "--data_file", help="The location of the data.csv file from Nestor")
     parser.add_argument("-lf", "--labels_file", help="The location of the labels.csv file from Nestor")
+    parser.add_argument("-bd", "--binary_dir", help="Directory for the binary (memory-mappable) copy of the split, "
+                                                    "see preprocessing.dataset")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the files even if the split is cached")
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.no_cache:
+        cache.disable()
+
     DATA_FILE = args.data_file if args.data_file else "data.csv"
     LABEL_FILE = args.labels_file if args.labels_file else "labels.csv"
+    BINARY_DIR = args.binary_dir if args.binary_dir else "dataset"
 
-    data = pd.read_csv(DATA_FILE, header=None)
-    labels = pd.read_csv(LABEL_FILE, header=None)
-
-    data_labelled = data[:len(labels.index)]
-    data_unlabelled = data[len(labels.index):]
+    data_labelled, data_unlabelled, labels = split_data(DATA_FILE, LABEL_FILE)
 
     data_labelled.to_csv("known_labels.csv")
     data_unlabelled.to_csv("unknown_labels.csv")
 
-
-
-
+    dataset.write_dataset(data_labelled, data_unlabelled, labels, BINARY_DIR)
@@ -0,0 +1,192 @@
+##
+# Text analysis pipeline shared by indexing and querying.
+#
+# An Analyzer turns a string into the list of terms that are indexed (or
+# looked up for a query):
+#
+#   1. lower casing of the whole text (one call instead of one per token)
+#   2. tokenization, on whitespace or with a precompiled regular expression
+#   3. normalization of every distinct surface form: stop word removal and
+#      stemming
+#
+# Step 3 is memoized: the normalized form of a token is kept in a bounded
+# dictionary, so the stemmer runs once per distinct word rather than once
+# per occurrence.  The memoized terms are interned, every occurrence of a
+# term refers to the same string object, which makes the dictionary
+# lookups in the lexicon cheaper and saves memory when many copies of a
+# term are kept.
+#
+# The default Analyzer splits on whitespace and lower cases, the original
+# behaviour of InvertedIndex.process_text.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import re
+import sys
+
+# A small English stop word list
+ENGLISH_STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+STOP_WORDS = {
+    'english': ENGLISH_STOP_WORDS,
+}
+
+
+##
+# The "S" stemmer (Harman, 1991), conflates singular and plural forms.
+#
+# @param word - Lower case word.
+#
+# @return Stem of the word.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def s_stemmer(word):
+    if len(word) > 3 and word.endswith('ies') and not word.endswith(('eies', 'aies')):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('es') and not word.endswith(('aes', 'ees', 'oes')):
+        return word[:-1]
+    if len(word) > 2 and word.endswith('s') and not word.endswith(('us', 'ss')):
+        return word[:-1]
+
+    return word
+
+
+STEMMERS = {
+    's': s_stemmer,
+}
+
+
+class Analyzer:
+    ##
+    # Constructor
+    #
+    # @param pattern    - Regular expression matching a token, None to
+    #                     split on whitespace.
+    # @param lowercase  - Lower case the text before tokenizing.
+    # @param stop_words - Name of a list in STOP_WORDS or an iterable of
+    #                     words to drop (compared after lower casing).
+    # @param stemmer    - Name of a stemmer in STEMMERS or None.
+    # @param cache_size - Most distinct tokens whose normalized form is
+    #                     memoized.  Tokens seen once the memo is full are
+    #                     normalized every time.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, pattern=None, lowercase=True, stop_words=None, stemmer=None, cache_size=65536):
+        self.pattern = pattern
+        self.lowercase = lowercase
+        self.stemmer = stemmer
+        self.cache_size = cache_size
+
+        if isinstance(stop_words, str):
+            try:
+                stop_words = STOP_WORDS[stop_words]
+            except KeyError:
+                raise ValueError("Unknown stop word list '" + stop_words + "', expected one of "
+                                 + ", ".join(sorted(STOP_WORDS))) from None
+        self.stop_words = frozenset(stop_words or ())
+
+        if stemmer is not None and stemmer not in STEMMERS:
+            raise ValueError("Unknown stemmer '" + str(stemmer) + "', expected one of "
+                             + ", ".join(sorted(STEMMERS)))
+        self._stem = STEMMERS.get(stemmer)
+
+        self._tokenize = re.compile(pattern).findall if pattern is not None else str.split
+
+        # Token -> normalized term, '' for a dropped token
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    ##
+    # Analyzes a string of text.
+    #
+    # @param text - String of text.
+    #
+    # @return List of the terms of the text, in order.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def analyze(self, text):
+        if self.lowercase:
+            text = text.lower()
+
+        memo = self.memo
+        tokens = self._tokenize(text)
+        terms = []
+        misses = 0
+        for token in tokens:
+            term = memo.get(token)
+            if term is None:
+                misses += 1
+                term = self._normalize(token)
+                if len(memo) < self.cache_size:
+                    memo[token] = term
+            if term:
+                terms.append(term)
+
+        self.hits += len(tokens) - misses
+        self.misses += misses
+
+        return terms
+
+    # Normalized, interned form of a token, '' if it is dropped
+    def _normalize(self, token):
+        if token in self.stop_words:
+            return ''
+        if self._stem is not None:
+            token = self._stem(token)
+
+        return sys.intern(token)
+
+    # Empties the memo, the counters are kept
+    def clear_cache(self):
+        self.memo.clear()
+
+    # Returns the memo counters as a dictionary
+    def cache_stats(self):
+        return {
+            'size': len(self.memo),
+            'maxsize': self.cache_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    # JSON serialisable settings, Analyzer.from_config rebuilds the analyzer
+    def config(self):
+        return {
+            'pattern': self.pattern,
+            'lowercase': self.lowercase,
+            'stop_words': sorted(self.stop_words),
+            'stemmer': self.stemmer,
+            'cache_size': self.cache_size,
+        }
+
+    # Builds an analyzer from the settings returned by config
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config) if config is not None else cls()
+
+    # Pickled by settings only, so worker processes start with an empty memo
+    def __reduce__(self):
+        return Analyzer.from_config, (self.config(),)
+
+    def __call__(self, text):
+        return self.analyze(text)
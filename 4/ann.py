@@ -0,0 +1,240 @@
+##
+# Approximate nearest neighbour search over LSA document vectors.
+#
+# Both indexes take unit length vectors (SemanticSpace.doc_vectors) and
+# unit length queries (SemanticSpace.query_vectors), select a small set
+# of candidate documents and re-rank the candidates exactly by cosine
+# (the dot product of the unit vectors), so returned scores are the same
+# as SemanticSpace.score_documents would give.
+#
+#   IVFIndex - inverted file.  Spherical k-means splits the documents
+#              into nlist clusters; a query scores only the documents of
+#              its nprobe nearest clusters.
+#   LSHIndex - random hyperplane locality sensitive hashing.  Each table
+#              hashes a vector to the signs of n_bits random projections;
+#              a query scores the documents sharing its bucket in any of
+#              the tables used.
+#
+# nprobe and the number of tables trade recall for latency, use
+# recall_at_k to pick them against brute force.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import time
+
+import numpy as np
+
+from semantic_space import normalize_rows, top_k_rows
+
+# Rows of the vectors matrix scored at a time during k-means assignment
+ASSIGN_BLOCK = 65536
+
+
+class IVFIndex:
+    ##
+    # Constructor
+    #
+    # @param vectors - NumPy array (documents, k) of unit length vectors.
+    # @param nlist   - Number of clusters, defaults to sqrt(documents).
+    # @param n_iter  - k-means iterations.
+    # @param seed    - Seed for the initial centroids.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, vectors, nlist=None, n_iter=10, seed=None):
+        self.vectors = vectors
+        n = vectors.shape[0]
+        nlist = min(nlist or max(1, int(np.sqrt(n))), max(n, 1))
+
+        rng = np.random.default_rng(seed)
+        self.centroids = np.array(vectors[rng.choice(n, nlist, replace=False)], dtype=np.float64) \
+            if n else np.zeros((0, vectors.shape[1]))
+
+        for _ in range(n_iter):
+            assign = self._assign(vectors)
+            sums = np.column_stack([np.bincount(assign, weights=vectors[:, j], minlength=nlist)
+                                    for j in range(vectors.shape[1])])
+            # Empty clusters keep their previous centroid
+            empty = ~sums.any(axis=1)
+            sums[empty] = self.centroids[empty]
+            self.centroids = normalize_rows(sums)
+
+        # Inverted lists: documents ordered by cluster plus offsets
+        assign = self._assign(vectors) if n else np.empty(0, dtype=np.intp)
+        self.order = np.argsort(assign, kind='stable')
+        self.offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=len(self.centroids)), out=self.offsets[1:])
+
+    # Nearest centroid of every vector, computed in blocks
+    def _assign(self, vectors):
+        assign = np.empty(vectors.shape[0], dtype=np.intp)
+        for start in range(0, vectors.shape[0], ASSIGN_BLOCK):
+            block = vectors[start:start + ASSIGN_BLOCK]
+            assign[start:start + ASSIGN_BLOCK] = np.argmax(block @ self.centroids.T, axis=1)
+
+        return assign
+
+    ##
+    # Finds the (approximately) top_k documents of each query.
+    #
+    # @param queries - NumPy array (queries, k) of unit length vectors.
+    # @param top_k   - Number of documents per query.
+    # @param nprobe  - Number of nearest clusters searched per query.
+    #
+    # @return ids, scores - NumPy arrays (queries, top_k), best first.
+    #                       Padded with -1 / -inf if fewer candidates.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def search(self, queries, top_k=10, nprobe=1):
+        queries = np.atleast_2d(queries)
+        nprobe = min(nprobe, len(self.centroids))
+        probes, _ = top_k_rows(queries @ self.centroids.T, nprobe)
+
+        candidates = [np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in row])
+                      if len(row) else np.empty(0, dtype=np.intp) for row in probes]
+
+        return rerank(self.vectors, queries, candidates, top_k)
+
+
+class LSHIndex:
+    ##
+    # Constructor
+    #
+    # @param vectors  - NumPy array (documents, k) of unit length vectors.
+    # @param n_tables - Number of hash tables.
+    # @param n_bits   - Hyperplanes (bits) per table, more bits give
+    #                   smaller buckets.
+    # @param seed     - Seed for the hyperplanes.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, vectors, n_tables=8, n_bits=12, seed=None):
+        if n_bits > 62:
+            raise ValueError("n_bits must be at most 62")
+
+        self.vectors = vectors
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, vectors.shape[1], n_bits))
+        self.powers = 1 << np.arange(n_bits, dtype=np.int64)
+
+        # Per table: sorted bucket codes, their offsets and the documents
+        self.tables = []
+        for t in range(n_tables):
+            codes = self._hash(vectors, t)
+            order = np.argsort(codes, kind='stable')
+            buckets, starts = np.unique(codes[order], return_index=True)
+            self.tables.append((buckets, np.append(starts, len(codes)), order))
+
+    # Bucket code of every vector in table t
+    def _hash(self, vectors, t):
+        return ((vectors @ self.planes[t]) > 0).astype(np.int64) @ self.powers
+
+    ##
+    # Finds the (approximately) top_k documents of each query.
+    #
+    # @param queries  - NumPy array (queries, k) of unit length vectors.
+    # @param top_k    - Number of documents per query.
+    # @param n_tables - Number of tables searched, all of them by default.
+    #
+    # @return ids, scores - NumPy arrays (queries, top_k), best first.
+    #                       Padded with -1 / -inf if fewer candidates.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def search(self, queries, top_k=10, n_tables=None):
+        queries = np.atleast_2d(queries)
+        n_tables = len(self.tables) if n_tables is None else min(n_tables, len(self.tables))
+
+        found = [[] for _ in range(len(queries))]
+        for t in range(n_tables):
+            buckets, bounds, order = self.tables[t]
+            codes = self._hash(queries, t)
+            slots = np.searchsorted(buckets, codes)
+            for q, (slot, code) in enumerate(zip(slots, codes)):
+                if slot < len(buckets) and buckets[slot] == code:
+                    found[q].append(order[bounds[slot]:bounds[slot + 1]])
+
+        candidates = [np.unique(np.concatenate(f)) if f else np.empty(0, dtype=np.intp) for f in found]
+
+        return rerank(self.vectors, queries, candidates, top_k)
+
+
+##
+# Exact re-ranking of candidate documents.
+#
+# @param vectors    - NumPy array (documents, k) of unit length vectors.
+# @param queries    - NumPy array (queries, k) of unit length vectors.
+# @param candidates - List with an array of candidate documents per query.
+# @param top_k      - Number of documents per query.
+#
+# @return ids, scores - NumPy arrays (queries, top_k), best first, padded
+#                       with -1 / -inf.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def rerank(vectors, queries, candidates, top_k):
+    ids = np.full((len(queries), top_k), -1, dtype=np.intp)
+    scores = np.full((len(queries), top_k), -np.inf)
+
+    for q, docs in enumerate(candidates):
+        if len(docs) == 0:
+            continue
+        cand_ids, cand_scores = top_k_rows((vectors[docs] @ queries[q])[np.newaxis, :], top_k)
+        n = cand_ids.shape[1]
+        ids[q, :n] = docs[cand_ids[0]]
+        scores[q, :n] = cand_scores[0]
+
+    return ids, scores
+
+
+##
+# Measures the recall and speed of an approximate index against brute
+# force search.
+#
+# @param index   - IVFIndex or LSHIndex.
+# @param queries - NumPy array (queries, k) of unit length vectors.
+# @param top_k   - Size of the result lists compared.
+# @param params  - Search parameters, e.g. nprobe=4 or n_tables=4.
+#
+# @return Dictionary with
+#         recall              - mean fraction of the exact top_k found
+#         ann_s_per_query     - seconds per query, approximate search
+#         exact_s_per_query   - seconds per query, brute force
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def recall_at_k(index, queries, top_k=10, **params):
+    queries = np.atleast_2d(queries)
+    n = max(len(queries), 1)
+
+    start = time.perf_counter()
+    exact, _ = top_k_rows(queries @ index.vectors.T, top_k)
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx, _ = index.search(queries, top_k, **params)
+    ann_time = time.perf_counter() - start
+
+    found = [len(np.intersect1d(e, a[a >= 0])) / max(len(e), 1) for e, a in zip(exact, approx)]
+
+    return {
+        'recall': float(np.mean(found)) if found else 1.0,
+        'ann_s_per_query': ann_time / n,
+        'exact_s_per_query': exact_time / n,
+    }
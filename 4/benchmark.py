@@ -0,0 +1,315 @@
+##
+# Benchmark of the inverted index / LSA pipeline on synthetic corpora.
+#
+# A corpus of n documents is generated with word frequencies following
+# Zipf's law (the word of rank r occurs with probability proportional to
+# 1 / r^s), with a vocabulary growing with the corpus (Heaps' law).  For
+# every scale the following stages are timed separately:
+#
+#   index         - InvertedIndex.add_document for every document
+#   finalize      - InvertedIndex.finalize
+#   sparse_matrix - generate_sparse_term_by_doc_matrix
+#   dense_matrix  - generate_term_by_doc_matrix, skipped when the dense
+#                   matrix would exceed DENSE_LIMIT cells
+#   svd           - the decomposition in the SemanticSpace constructor
+#   fold_in       - folding in a batch of queries
+#   rank          - ranking the documents for the same batch
+#
+# together with the peak resident memory.  Every scale runs in a fresh
+# process, so the peak is that scale's alone rather than the high-water
+# mark of all the scales before it.  Results are written as JSON; given a
+# baseline file, a stage that slowed down or a peak memory that grew by
+# more than the threshold fails the run (exit status 1).
+#
+# With --compact the compact (float32 / float16) semantic spaces are
+# built as well and their memory and cosines compared with the float64
+# space; a cosine error above COMPACT_TOLERANCE also fails the run.
+#
+# Usage:
+#   python benchmark.py --scales 1000,10000 --output bench.json
+#   python benchmark.py --scales 1000,10000 --baseline bench.json --threshold 0.2
+#   python benchmark.py --scales 10000 --compact
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+# 18/10/2026 - Compact mode check.
+###
+
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from inverted_index import InvertedIndex
+from semantic_space import SemanticSpace
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Largest terms X docs matrix generate_term_by_doc_matrix is timed for
+DENSE_LIMIT = 50000000
+
+STAGES = ('index', 'finalize', 'sparse_matrix', 'dense_matrix', 'svd', 'fold_in', 'rank')
+
+# Largest allowed difference between a compact and a float64 cosine
+COMPACT_TOLERANCE = {'float32': 1e-4, 'float16': 5e-3}
+
+
+##
+# Generates a synthetic Zipfian corpus.
+#
+# @param n_docs     - Number of documents.
+# @param doc_length - Mean number of words per document (Poisson).
+# @param vocab_size - Number of distinct words, by default 20 * n^0.6
+#                     (Heaps' law) with at least 1000.
+# @param s          - Zipf exponent.
+# @param seed       - Random seed, the same seed gives the same corpus.
+#
+# @return Generator of (document identifier, text) pairs.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def zipf_corpus(n_docs, doc_length=100, vocab_size=None, s=1.1, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab_size = vocab_size or max(1000, int(20 * n_docs ** 0.6))
+
+    cdf = np.cumsum(1.0 / np.arange(1, vocab_size + 1) ** s)
+    cdf /= cdf[-1]
+    words = np.array(["w" + str(r) for r in range(vocab_size)])
+
+    # Generated in chunks so the corpus is never held in memory at once
+    chunk = 10000
+    for start in range(0, n_docs, chunk):
+        count = min(chunk, n_docs - start)
+        lengths = np.maximum(rng.poisson(doc_length, count), 1)
+        ranks = np.minimum(np.searchsorted(cdf, rng.random(int(lengths.sum()))), vocab_size - 1)
+        bounds = np.concatenate(([0], np.cumsum(lengths)))
+        for j in range(count):
+            yield "d" + str(start + j), " ".join(words[ranks[bounds[j]:bounds[j + 1]]])
+
+
+# Peak resident set size of the process in MiB, None if unknown.  This is
+# the high-water mark since the process started, see run.
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+##
+# Runs the pipeline on one synthetic corpus.
+#
+# @param n_docs    - Number of documents.
+# @param k         - Dimension of the semantic space.
+# @param n_queries - Number of queries in the fold in / rank batch.
+# @param top_k     - Documents ranked per query.
+# @param svd       - Decomposition backend of the SemanticSpace.
+# @param seed      - Random seed of the corpus and queries.
+# @param compact   - Also check the compact modes, see check_compact.
+#
+# @return Dictionary with the corpus size, the seconds per stage (None
+#         for a skipped stage), the peak memory and the compact check.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+# 18/10/2026 - Compact mode check.
+###
+def run_scale(n_docs, k=100, n_queries=100, top_k=10, svd='auto', seed=0, compact=False):
+    stages = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        stages[name] = time.perf_counter() - start
+        return result
+
+    I = InvertedIndex()
+    corpus = zipf_corpus(n_docs, seed=seed)
+    timed('index', lambda: [I.add_document(d) for d in corpus])
+    timed('finalize', I.finalize)
+    A = timed('sparse_matrix', I.generate_sparse_term_by_doc_matrix)
+
+    if I.get_total_terms() * I.get_total_docs() <= DENSE_LIMIT:
+        timed('dense_matrix', I.generate_term_by_doc_matrix)
+    else:
+        stages['dense_matrix'] = None
+
+    k = min(k, min(A.shape) - 1)
+    ss = timed('svd', lambda: SemanticSpace(I, A, max_dimension=k, svd=svd))
+
+    queries = [text for _, text in zipf_corpus(n_queries, doc_length=4, seed=seed + 1)]
+    timed('fold_in', lambda: ss.fold_in_queries(queries))
+    ss.clear_caches()
+    timed('rank', lambda: ss.rank_documents(queries, top_k))
+
+    result = {
+        'docs': I.get_total_docs(),
+        'terms': I.get_total_terms(),
+        'postings': int(A.nnz),
+        'k': k,
+        'stages': stages,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+    if compact:
+        result['compact'] = check_compact(ss, queries, top_k)
+
+    return result
+
+
+##
+# Compares compact semantic spaces with a float64 one.
+#
+# @param ss      - SemanticSpace in the default float64 mode.
+# @param queries - Query strings.
+# @param top_k   - Documents ranked per query.
+#
+# @return Dictionary per document dtype ('float32', 'float16') with the
+#         bytes held relative to ss, the largest cosine difference, the
+#         mean overlap of the top_k lists and whether the difference is
+#         within COMPACT_TOLERANCE.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def check_compact(ss, queries, top_k=10):
+    exact = ss.score_documents(queries)
+    exact_ids, _ = ss.rank_documents(queries, top_k)
+
+    result = {}
+    for dtype in COMPACT_TOLERANCE:
+        small = SemanticSpace(ss.I, ss.A, max_dimension=ss.max_dimension, svd=ss.svd, compact=True, doc_dtype=dtype)
+        error = float(np.max(np.abs(small.score_documents(queries) - exact))) if exact.size else 0.0
+        ids, _ = small.rank_documents(queries, top_k)
+        overlap = [len(np.intersect1d(a, b)) / max(len(a), 1) for a, b in zip(exact_ids, ids)]
+        result[dtype] = {
+            'memory_ratio': small.nbytes() / ss.nbytes(),
+            'max_cosine_error': error,
+            'top_k_overlap': float(np.mean(overlap)) if overlap else 1.0,
+            'within_tolerance': error <= COMPACT_TOLERANCE[dtype],
+        }
+
+    return result
+
+
+##
+# Compares a run with a baseline run.
+#
+# @param baseline  - Results dictionary of the baseline (as written).
+# @param current   - Results dictionary of this run.
+# @param threshold - Allowed relative slow down of a stage, 0.2 = 20%.
+# @param min_seconds - Slow downs smaller than this are timing noise and
+#                     never count as a regression.
+# @param min_memory_mb - Same for growths of the peak memory.
+#
+# @return List of (docs, stage, baseline, current) of the stages that
+#         regressed, in seconds, and of the peak memory ('peak_memory_mb'
+#         as the stage) if it grew by more than the threshold, in MiB.
+#         Scales or stages missing from either run are not compared.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+# 18/10/2026 - Peak memory compared as well.
+###
+def compare(baseline, current, threshold=0.2, min_seconds=0.01, min_memory_mb=5.0):
+    base = {r['docs']: r for r in baseline['results']}
+
+    regressions = []
+    for result in current['results']:
+        before = base.get(result['docs'], {'stages': {}})
+        measured = [(stage, seconds, before['stages'].get(stage), min_seconds)
+                    for stage, seconds in result['stages'].items()]
+        measured.append(('peak_memory_mb', result.get('peak_memory_mb'), before.get('peak_memory_mb'),
+                         min_memory_mb))
+
+        for stage, value, previous, noise in measured:
+            if value is None or previous is None:
+                continue
+            if value > previous * (1 + threshold) and value - previous > noise:
+                regressions.append((result['docs'], stage, previous, value))
+
+    return regressions
+
+
+# Runs run_scale in a fresh process, so its peak memory is its own
+def _run_isolated(*args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_scale, *args).result()
+
+
+# Runs every scale, each in its own process unless isolate is False, and
+# returns the results dictionary
+def run(scales, k=100, n_queries=100, top_k=10, svd='auto', seed=0, compact=False, isolate=True):
+    results = []
+    for n in scales:
+        result = (_run_isolated if isolate else run_scale)(n, k, n_queries, top_k, svd, seed, compact)
+        results.append(result)
+        print("{0:>9} docs {1:>9} terms  ".format(result['docs'], result['terms'])
+              + "  ".join("{0} {1}".format(stage, "-" if t is None else "%.3fs" % t)
+                          for stage, t in result['stages'].items())
+              + "  peak {0}".format("-" if result['peak_memory_mb'] is None
+                                    else "%.1f MiB" % result['peak_memory_mb']), flush=True)
+        for dtype, check in result.get('compact', {}).items():
+            print("          compact {0}: memory x{1:.2f}  max cosine error {2:.2e}  top-k overlap {3:.3f}"
+                  .format(dtype, check['memory_ratio'], check['max_cosine_error'], check['top_k_overlap']))
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'settings': {'k': k, 'queries': n_queries, 'top_k': top_k, 'svd': svd, 'seed': seed},
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the inverted index and semantic space on synthetic "
+                                                 "Zipfian corpora.")
+    parser.add_argument("--scales", default="1000,10000,100000,1000000",
+                        help="Comma separated numbers of documents.")
+    parser.add_argument("--k", type=int, default=100, help="Dimension of the semantic space.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries per batch.")
+    parser.add_argument("--top-k", type=int, default=10, help="Documents ranked per query.")
+    parser.add_argument("--svd", default="auto", help="Decomposition backend.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--output", help="File to write the JSON results to.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative slow down of a stage against the baseline.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Check the memory and cosine error of the compact semantic space.")
+    args = parser.parse_args()
+
+    current = run([int(n) for n in args.scales.split(",")], args.k, args.queries, args.top_k, args.svd, args.seed,
+                  args.compact)
+    failed = any(not check['within_tolerance']
+                 for result in current['results'] for check in result.get('compact', {}).values())
+
+    if args.output:
+        with open(args.output, 'w') as file_obj:
+            json.dump(current, file_obj, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as file_obj:
+            regressions = compare(json.load(file_obj), current, args.threshold)
+        for docs, stage, before, after in regressions:
+            unit = " MiB" if stage == 'peak_memory_mb' else "s"
+            print("REGRESSION {0} docs {1}: {2:.3f}{4} -> {3:.3f}{4}".format(docs, stage, before, after, unit))
+        failed = failed or bool(regressions)
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,321 @@
+##
+# Boolean and phrase query evaluation over an InvertedIndex.
+#
+# Query syntax:
+#   human computer          - both terms (AND is implied)
+#   human AND computer      - both terms
+#   human OR user           - either term
+#   NOT system              - documents without the term
+#   "graph minors"          - the exact phrase (needs a positional index)
+#   (human OR user) AND NOT "response time"
+#
+# Words and phrases go through the index's process_text, so they match the
+# indexed terms.  A word that processes to nothing (e.g. a stop word) is
+# ignored.
+#
+# Results are sorted NumPy arrays of document ordinals.  Conjunctions are
+# evaluated smallest (estimated) operand first and intersected with
+# galloping (exponential) search, so the cost depends on the shortest
+# postings list rather than the longest.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+# Below this size ratio intersecting with a linear merge beats galloping
+GALLOP_RATIO = 16
+
+
+class BooleanQuery:
+    ##
+    # Constructor
+    #
+    # @param I - InvertedIndex to evaluate queries against.  Phrase queries
+    #            need it to be positional.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, I):
+        self.I = I
+
+    ##
+    # Evaluates a query.
+    #
+    # @param query - Query string, see the syntax above.
+    #
+    # @return Sorted NumPy int32 array of the ordinals of the matching
+    #         documents.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def evaluate(self, query):
+        tree = self.parse(query)
+        if tree is None:
+            return np.empty(0, dtype=np.int32)
+
+        return self._evaluate(tree)
+
+    # Same as evaluate, but returns the document identifiers
+    def documents(self, query):
+        return [self.I.docs[d] for d in self.evaluate(query)]
+
+    ##
+    # Parses a query into a tree of tuples:
+    #   ('term', postings)           ('phrase', [postings, ...])
+    #   ('and', [node, ...])         ('or', [node, ...])
+    #   ('not', node)                ('none',) - term not in the index
+    #
+    # @param query - Query string.
+    #
+    # @return The root node, or None for a query without any terms.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def parse(self, query):
+        self._tokens = _TOKEN.findall(query)
+        self._pos = 0
+
+        tree = self._parse_or()
+        if self._pos < len(self._tokens):
+            raise ValueError("Unexpected '" + self._tokens[self._pos] + "' in query")
+
+        return tree
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _parse_or(self):
+        nodes = [self._parse_and()]
+        while self._peek() == 'OR':
+            self._pos += 1
+            nodes.append(self._parse_and())
+
+        return _combine('or', nodes)
+
+    def _parse_and(self):
+        nodes = [self._parse_not()]
+        while self._peek() not in (None, 'OR', ')'):
+            if self._peek() == 'AND':
+                self._pos += 1
+            nodes.append(self._parse_not())
+
+        return _combine('and', nodes)
+
+    def _parse_not(self):
+        if self._peek() == 'NOT':
+            self._pos += 1
+            node = self._parse_not()
+            return None if node is None else ('not', node)
+
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of query")
+        self._pos += 1
+
+        if token == '(':
+            node = self._parse_or()
+            if self._peek() != ')':
+                raise ValueError("Missing ')' in query")
+            self._pos += 1
+            return node
+
+        if token == ')':
+            raise ValueError("Unexpected ')' in query")
+
+        terms = self.I.process_text(token.strip('"'))
+        if not terms:
+            return None
+
+        postings = []
+        for t in terms:
+            trm, _ = self.I.search_for_term(t)
+            if trm is None:
+                return ('none',)
+            postings.append(trm[1])
+
+        if len(postings) == 1:
+            return ('term', postings[0])
+        if not self.I.positional:
+            raise ValueError("Phrase queries need a positional InvertedIndex")
+
+        return ('phrase', postings)
+
+    ##
+    # Evaluates a parsed query tree.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def _evaluate(self, node):
+        kind = node[0]
+
+        if kind == 'none':
+            return np.empty(0, dtype=np.int32)
+        if kind == 'term':
+            return node[1].doc_array()
+        if kind == 'phrase':
+            return self._phrase(node[1])
+        if kind == 'not':
+            return np.setdiff1d(np.arange(self.I.get_total_docs(), dtype=np.int32),
+                                self._evaluate(node[1]), assume_unique=True)
+        if kind == 'or':
+            result = np.empty(0, dtype=np.int32)
+            for child in node[1]:
+                result = np.union1d(result, self._evaluate(child)).astype(np.int32)
+            return result
+
+        # AND - positive operands smallest first, then remove the negated ones
+        positive = sorted((c for c in node[1] if c[0] != 'not'), key=self._estimate)
+        negative = [c[1] for c in node[1] if c[0] == 'not']
+
+        if positive:
+            result = self._evaluate(positive[0])
+            for child in positive[1:]:
+                if len(result) == 0:
+                    break
+                result = intersect(result, self._operand(child))
+        else:
+            result = np.arange(self.I.get_total_docs(), dtype=np.int32)
+
+        for child in negative:
+            if len(result) == 0:
+                break
+            result = np.setdiff1d(result, self._evaluate(child), assume_unique=True)
+
+        return result
+
+    # Operand of an intersection: a term's postings are searched in place
+    # rather than copied into a new array, so they cost no more than the
+    # galloping search over them
+    def _operand(self, node):
+        return node[1].doc_ids if node[0] == 'term' else self._evaluate(node)
+
+    # Upper bound on the number of documents a node can match
+    def _estimate(self, node):
+        kind = node[0]
+
+        if kind == 'none':
+            return 0
+        if kind == 'term':
+            return len(node[1])
+        if kind == 'phrase':
+            return min(len(p) for p in node[1])
+        if kind == 'or':
+            return sum(self._estimate(c) for c in node[1])
+        if kind == 'and':
+            return min(self._estimate(c) for c in node[1] if c[0] != 'not') \
+                if any(c[0] != 'not' for c in node[1]) else self.I.get_total_docs()
+
+        return self.I.get_total_docs()
+
+    ##
+    # Documents containing the terms of a phrase at consecutive positions.
+    #
+    # The documents containing every term are found first (shortest
+    # postings list first), then the positions are checked in those only.
+    #
+    # @param postings - PositionalPostings of the phrase's terms, in order.
+    #
+    # @return Sorted NumPy int32 array of document ordinals.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def _phrase(self, postings):
+        by_length = sorted(postings, key=len)
+        candidates = by_length[0].doc_array()
+        for p in by_length[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = intersect(candidates, p.doc_ids)
+
+        matches = []
+        cursors = [0] * len(postings)
+        for d in candidates:
+            # Candidates are increasing, so each search can start at the
+            # previous posting
+            starts = None
+            for offset, p in enumerate(postings):
+                cursors[offset] = p.find(d, cursors[offset])
+                shifted = {x - offset for x in p.positions_of(cursors[offset])}
+                starts = shifted if starts is None else starts & shifted
+                if not starts:
+                    break
+            if starts:
+                matches.append(d)
+
+        return np.array(matches, dtype=np.int32)
+
+
+# Builds an and/or node, dropping empty operands and flattening single ones
+def _combine(kind, nodes):
+    nodes = [n for n in nodes if n is not None]
+    if not nodes:
+        return None
+    if len(nodes) == 1:
+        return nodes[0]
+
+    return (kind, nodes)
+
+
+##
+# Intersects two sorted arrays of unique document ordinals.
+#
+# When one list is much shorter than the other each of its elements is
+# located in the longer list with a galloping search: the step doubles
+# from the previous match until it overshoots, then a binary search is
+# done in the last step.  Otherwise a linear merge is cheaper.
+#
+# @param a, b - Sorted NumPy int arrays or int sequences supporting
+#               indexing (e.g. Postings.doc_ids), used in place.
+#
+# @return Sorted NumPy int32 array of the ordinals in both.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def intersect(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return np.empty(0, dtype=np.int32)
+    if len(a) * GALLOP_RATIO > len(b):
+        return np.intersect1d(np.asarray(a), np.asarray(b), assume_unique=True).astype(np.int32)
+
+    n = len(b)
+    result = []
+    lo = 0
+    for x in (a.tolist() if isinstance(a, np.ndarray) else a):
+        step = 1
+        hi = lo
+        while hi < n and b[hi] < x:
+            lo = hi + 1
+            hi += step
+            step *= 2
+        lo = bisect_left(b, x, lo, min(hi + 1, n))
+        if lo == n:
+            break
+        if b[lo] == x:
+            result.append(x)
+
+    return np.array(result, dtype=np.int32)
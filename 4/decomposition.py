@@ -0,0 +1,170 @@
+##
+# Decomposition backends for the semantic space.
+#
+# Each backend computes the top-k singular triplets of a term by document
+# matrix A and returns them in the same layout as np.linalg.svd with
+# full_matrices=False:
+#
+#   T  - total_terms X k matrix of left singular vectors
+#   S  - the k singular values in decreasing order
+#   Dt - k X total_docs matrix of right singular vectors
+#
+# Available backends:
+#   dense      - exact, full LAPACK SVD of the densified matrix, truncated
+#                to k.  Only sensible for small matrices.
+#   arpack     - exact top-k via Lanczos iteration (scipy svds) working
+#                directly on the sparse matrix.
+#   randomized - randomized range finder (Halko, Martinsson & Tropp) with
+#                oversampling and power iterations.  Approximate, but the
+#                cheapest for large k and very large sparse matrices.
+#   auto       - dense for matrices of at most AUTO_DENSE_CELLS cells,
+#                arpack otherwise.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+
+# Largest total_terms * total_docs for which "auto" uses the dense SVD
+# (8 MB densified).  The cell count, not the smaller dimension, decides:
+# a few hundred documents over a million terms must not be densified.
+AUTO_DENSE_CELLS = 10 ** 6
+
+
+##
+# Exact SVD through LAPACK.
+#
+# @param A - Term by document matrix (sparse or dense).
+# @param k - Number of singular triplets to keep, None keeps all of them.
+#
+# @return T, S, Dt truncated to k.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def svd_dense(A, k=None):
+    if sparse.issparse(A):
+        A = A.toarray()
+
+    T, S, Dt = np.linalg.svd(A, full_matrices=False)
+
+    return T[:, :k], S[:k], Dt[:k, :]
+
+
+##
+# Top-k SVD using ARPACK's Lanczos iteration on the sparse matrix.
+#
+# ARPACK can only compute k < min(A.shape) triplets, so larger requests
+# fall back to the dense SVD.
+#
+# @param A   - Term by document matrix (sparse or dense).
+# @param k   - Number of singular triplets to compute.
+# @param tol - Convergence tolerance passed to svds (0 is machine precision).
+#
+# @return T, S, Dt with k components.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def svd_arpack(A, k, tol=0):
+    if k >= min(A.shape):
+        return svd_dense(A, k)
+
+    T, S, Dt = svds(sparse.csr_matrix(A, dtype=np.float64), k=k, tol=tol)
+
+    # svds returns the singular values in increasing order
+    order = np.argsort(S)[::-1]
+
+    return T[:, order], S[order], Dt[order, :]
+
+
+##
+# Randomized SVD.
+#
+# Projects A onto a random (k + oversamples) dimensional subspace, refines
+# the subspace with power iterations (re-orthonormalised each time to keep
+# precision) and computes an exact SVD of the small projected matrix.
+#
+# @param A          - Term by document matrix (sparse or dense).
+# @param k          - Number of singular triplets to compute.
+# @param oversamples - Extra random directions, improves accuracy.
+# @param n_iter     - Number of power iterations, helps when the singular
+#                     values decay slowly.
+# @param seed       - Seed (or np.random.Generator) for the random projection.
+#
+# @return T, S, Dt with k components.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def svd_randomized(A, k, oversamples=10, n_iter=4, seed=None):
+    rng = np.random.default_rng(seed)
+    n_random = min(k + oversamples, min(A.shape))
+
+    # Range finder, Q approximates the span of the top left singular vectors
+    Q = A @ rng.standard_normal((A.shape[1], n_random))
+    Q, _ = np.linalg.qr(Q)
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(A.T @ Q)
+        Q, _ = np.linalg.qr(A @ Q)
+
+    # B = Q^T A is small (n_random X total_docs)
+    B = np.asarray((A.T @ Q).T)
+    U_b, S, Dt = np.linalg.svd(B, full_matrices=False)
+    T = Q @ U_b
+
+    return T[:, :k], S[:k], Dt[:k, :]
+
+
+##
+# Chooses between the dense and ARPACK backends based on the number of
+# cells of the matrix.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+# 18/10/2026 - Decides on the cell count.
+###
+def svd_auto(A, k):
+    if A.shape[0] * A.shape[1] <= AUTO_DENSE_CELLS:
+        return svd_dense(A, k)
+
+    return svd_arpack(A, k)
+
+
+BACKENDS = {
+    'dense': svd_dense,
+    'arpack': svd_arpack,
+    'randomized': svd_randomized,
+    'auto': svd_auto,
+}
+
+
+##
+# Looks up a decomposition backend.
+#
+# @param backend - Name of a backend in BACKENDS, or a callable with the
+#                  signature backend(A, k, **options) -> (T, S, Dt).
+#
+# @return The backend function.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def get_backend(backend):
+    if callable(backend):
+        return backend
+
+    try:
+        return BACKENDS[backend]
+    except KeyError:
+        raise ValueError("Unknown SVD backend '" + str(backend) + "', expected one of "
+                         + ", ".join(sorted(BACKENDS))) from None
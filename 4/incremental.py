@@ -0,0 +1,157 @@
+##
+# Incremental updates of the semantic space.
+#
+# Two ways of adding documents to an existing SemanticSpace without
+# recomputing the SVD:
+#
+#   fold in    - project the new documents onto the existing T and S
+#                (d^T T S^{-1}) and append them to Dt.  Very cheap, but T
+#                and S never change so the space slowly stops describing
+#                the collection and terms not seen at build time are
+#                ignored.
+#   svd update - Brand's incremental SVD ("Fast low-rank modifications of
+#                the thin singular value decomposition", 2006).  Updates
+#                T, S and Dt so they are the rank-k SVD of [A C], up to
+#                the error already introduced by truncating to rank k.
+#                New terms become new rows of T.
+#
+# The UpdatePolicy decides which one is used and when the accumulated
+# drift warrants a full recompute.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import numpy as np
+from scipy import sparse
+
+
+class UpdatePolicy:
+    ##
+    # Constructor
+    #
+    # @param method - 'fold' to fold in new documents, 'update' for the
+    #                 incremental SVD update.
+    # @param max_added_fraction - Rebuild once documents added since the
+    #                 last full decomposition exceed this fraction of the
+    #                 space.  None disables the check.
+    # @param max_residual_increase - Rebuild once the mean relative
+    #                 residual of the folded in documents (how badly the
+    #                 space represents them) exceeds that of the original
+    #                 documents by this much.  None disables the check.
+    # @param max_unknown_fraction - Rebuild once this fraction of the
+    #                 folded in term occurrences were of terms unknown to
+    #                 the space.  None disables the check.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, method='fold', max_added_fraction=0.2, max_residual_increase=0.1,
+                 max_unknown_fraction=0.2):
+        if method not in ('fold', 'update'):
+            raise ValueError("Unknown update method '" + str(method) + "', expected 'fold' or 'update'")
+
+        self.method = method
+        self.max_added_fraction = max_added_fraction
+        self.max_residual_increase = max_residual_increase
+        self.max_unknown_fraction = max_unknown_fraction
+
+    ##
+    # Decides whether a semantic space should be fully recomputed.
+    #
+    # @param drift - Dictionary as returned by SemanticSpace.drift().
+    #
+    # @return True if any of the thresholds has been exceeded.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def needs_rebuild(self, drift):
+        checks = [
+            (self.max_added_fraction, drift['added_fraction']),
+            (self.max_residual_increase, drift['residual_increase']),
+            (self.max_unknown_fraction, drift['unknown_fraction']),
+        ]
+
+        return any(limit is not None and value > limit for limit, value in checks)
+
+
+##
+# Relative residual of each column of C after projecting onto the column
+# space of T, ||c - T T^T c|| / ||c||.  T has orthonormal columns so this
+# is sqrt(1 - ||T^T c||^2 / ||c||^2) and never forms c - T T^T c.
+#
+# @param T - total_terms X k matrix with orthonormal columns.
+# @param C - Sparse total_terms X n matrix, rows beyond T are ignored.
+#
+# @return NumPy array of n residuals, zero for empty columns.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def projection_residuals(T, C):
+    C = sparse.csc_matrix(C)[:T.shape[0], :]
+    norms_sq = np.asarray(C.multiply(C).sum(axis=0)).ravel()
+    proj_sq = np.sum(np.asarray(C.T @ T) ** 2, axis=1)
+
+    ratio = np.divide(proj_sq, norms_sq, out=np.ones_like(norms_sq), where=norms_sq > 0)
+
+    return np.sqrt(np.clip(1.0 - ratio, 0.0, 1.0))
+
+
+##
+# Brand's rank-k update of a thin SVD for appended columns (documents).
+#
+# Given A ~= T diag(S) Dt, returns the rank k SVD of [A C].  C may have
+# more rows than T (new terms), T is padded with zero rows for them.
+#
+# @param T  - total_terms X r left singular vectors.
+# @param S  - r singular values.
+# @param Dt - r X total_docs right singular vectors.
+# @param C  - total_terms' X c matrix (sparse or dense) of new documents,
+#             total_terms' >= total_terms.
+# @param k  - Rank to keep.
+#
+# @return T, S, Dt of the updated rank k SVD.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def svd_update(T, S, Dt, C, k):
+    m, r = T.shape
+    new_rows = C.shape[0] - m
+    c = C.shape[1]
+    if new_rows > 0:
+        T = np.vstack([T, np.zeros((new_rows, r))])
+
+    C = C.toarray() if sparse.issparse(C) else np.asarray(C, dtype=np.float64)
+
+    # Part of C in the current space and the orthogonal remainder
+    M = T.T @ C
+    P = C - T @ M
+    Q, R = np.linalg.qr(P)
+
+    # Small (r + p) X (r + c) matrix whose SVD rotates the enlarged bases.
+    # p = min(total_terms', c): with more new documents than term rows the
+    # remainder spans at most total_terms' directions.
+    p = Q.shape[1]
+    K = np.zeros((r + p, r + c))
+    K[:r, :r] = np.diag(S)
+    K[:r, r:] = M
+    K[r:, r:] = R
+    U_k, S_k, Vt_k = np.linalg.svd(K, full_matrices=False)
+
+    U_k = U_k[:, :k]
+    Vt_k = Vt_k[:k, :]
+
+    T = np.hstack([T, Q]) @ U_k
+
+    # Right vectors are block diag(V, I) @ Vt_k^T, computed transposed
+    Dt = np.hstack([Vt_k[:, :r] @ Dt, Vt_k[:, r:]])
+
+    return T, S_k[:k], Dt
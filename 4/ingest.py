@@ -0,0 +1,271 @@
+##
+# Streaming, multi-process construction of an InvertedIndex.
+#
+# Documents are read lazily and handed out in batches to a pool of
+# worker processes.  Each worker tokenizes its batch and builds a partial
+# index in the style of SPIMI (single-pass in-memory indexing): terms go
+# straight into a dictionary and the partial index is written out as a
+# sorted "run" on disk (see InvertedIndex.save) whenever it holds more
+# than max_postings postings.  Only a bounded number of batches are in
+# flight at once, so memory does not grow with the size of the corpus.
+#
+# Finally the runs are combined with a k-way merge on the sorted terms.
+# Runs are numbered in input order and each run's document ordinals are
+# offset by the documents of the runs before it, so every merged postings
+# list stays in increasing ordinal order.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import heapq
+import os
+import shutil
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+import storage
+from analyzer import Analyzer
+from inverted_index import InvertedIndex
+from postings import Postings, PositionalPostings
+
+
+##
+# Lazily reads every ".txt" file of a folder, in name order.
+#
+# @param folder - Folder to find .txt files in.
+#
+# @return Generator of ordered pairs (a, b)
+#         a - document name (file name without extension)
+#         b - text of the document as a string
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def iter_documents(folder):
+    names = sorted(entry.name for entry in os.scandir(folder) if entry.name.endswith(".txt"))
+
+    for name in names:
+        try:
+            with open(os.path.join(folder, name), 'r') as file_obj:
+                text = file_obj.read()
+        except OSError as ex:
+            print("In method [iter_documents] - " + str(ex))
+            continue
+
+        yield name.rsplit('.', 1)[0], text
+
+
+##
+# Builds an inverted index from a stream of documents using a pool of
+# worker processes.
+#
+# @param documents    - Iterable of (document identifier, text) pairs.
+# @param workers      - Number of worker processes, defaults to the number
+#                       of CPUs.  0 builds in this process.
+# @param batch_size   - Documents sent to a worker at a time.
+# @param max_postings - A worker writes its partial index to disk once it
+#                       holds this many postings.
+# @param spill_dir    - Directory for the runs.  A temporary directory,
+#                       removed afterwards, is used if not given.
+# @param positional   - Build a positional index.
+# @param analyzer     - Analyzer used to process the text, the default
+#                       Analyzer if not given.  Each worker gets a copy
+#                       with the same settings.
+#
+# @return InvertedIndex containing all the documents (not finalized).
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+# 18/10/2026 - Configurable analyzer.
+###
+def build_index(documents, workers=None, batch_size=1000, max_postings=1000000, spill_dir=None,
+                positional=False, analyzer=None):
+    analyzer = analyzer if analyzer is not None else Analyzer()
+
+    cleanup = spill_dir is None
+    if cleanup:
+        spill_dir = tempfile.mkdtemp(prefix="index-runs-")
+    else:
+        os.makedirs(spill_dir, exist_ok=True)
+
+    try:
+        runs = []
+        tasks = ((n, batch, spill_dir, max_postings, positional, analyzer)
+                 for n, batch in enumerate(_batches(documents, batch_size)))
+
+        if workers == 0:
+            for task in tasks:
+                runs.extend(_index_batch(*task))
+        else:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Keep at most two batches per worker in flight and collect
+                # the results in submission order
+                pending = deque()
+                for task in tasks:
+                    pending.append(pool.submit(_index_batch, *task))
+                    if len(pending) >= 2 * workers:
+                        runs.extend(pending.popleft().result())
+                while pending:
+                    runs.extend(pending.popleft().result())
+
+        return merge_runs(runs, positional, analyzer)
+    finally:
+        if cleanup:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+##
+# k-way merge of runs written by InvertedIndex.save into a single index.
+#
+# @param paths      - Run directories, in document order.  Each run's
+#                     terms must be sorted (the run index was finalized).
+# @param positional - Whether the runs are positional (only used when
+#                     there are no runs).
+# @param analyzer   - Analyzer of the merged index, by default the one
+#                     the first run was saved with.
+#
+# @return InvertedIndex with the documents of all runs, in run order.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+# 18/10/2026 - Keeps the analyzer of the runs.
+###
+def merge_runs(paths, positional=False, analyzer=None):
+    runs = [_open_run(path) for path in paths]
+    if runs:
+        positional = runs[0]['positional']
+        if analyzer is None:
+            analyzer = Analyzer.from_config(runs[0]['analyzer'])
+
+    I = InvertedIndex(positional=positional, analyzer=analyzer)
+    base = 0
+    for run in runs:
+        run['base'] = base
+        base += len(run['docs'])
+        I.docs.extend(run['docs'])
+    I.doc_index = {d: j for j, d in enumerate(I.docs)}
+
+    # Merge the sorted term lists, ties are broken by run number so the
+    # postings of a term are concatenated in document order
+    streams = [_term_stream(run['terms'], r) for r, run in enumerate(runs)]
+    current = None
+    parts = []
+    for w, r, i in heapq.merge(*streams):
+        if w != current:
+            if parts:
+                _add_merged_term(I, current, parts)
+            current = w
+            parts = []
+        parts.append((runs[r], i))
+    if parts:
+        _add_merged_term(I, current, parts)
+
+    I.finalized = len(runs) <= 1
+
+    return I
+
+
+# Yields (term, run number, term index) for the sorted terms of a run
+def _term_stream(terms, r):
+    for i, w in enumerate(terms):
+        yield w, r, i
+
+
+# Appends a term whose postings are spread over several runs
+def _add_merged_term(I, w, parts):
+    doc_ids = []
+    tfs = []
+    positions = []
+    for run, i in parts:
+        start, stop = run['offsets'][i], run['offsets'][i + 1]
+        doc_ids.append(run['doc_ids'][start:stop] + run['base'])
+        tfs.append(run['tfs'][start:stop])
+        if I.positional:
+            positions.append(run['positions'][run['pos_offsets'][i]:run['pos_offsets'][i + 1]])
+
+    doc_ids = array('i', np.concatenate(doc_ids).astype(np.int32).tobytes())
+    tfs = array('i', np.concatenate(tfs).astype(np.int32).tobytes())
+    if I.positional:
+        postings = PositionalPostings.from_arrays(doc_ids, tfs, array('i', np.concatenate(positions).tobytes()))
+    else:
+        postings = Postings.from_arrays(doc_ids, tfs)
+    I.lexicon[w] = len(I.terms)
+    I.terms.append((w, postings))
+
+
+# Opens a run written by InvertedIndex.save without building Postings objects
+def _open_run(path):
+    manifest = storage.read_manifest(path, "inverted_index")
+
+    run = {
+        'positional': manifest.get("positional", False),
+        'analyzer': manifest.get("analyzer"),
+        'terms': storage.load_strings(path, "terms"),
+        'docs': storage.load_strings(path, "docs"),
+        'offsets': storage.load_array(path, "offsets", mmap=False),
+        'doc_ids': storage.load_array(path, "doc_ids"),
+        'tfs': storage.load_array(path, "tfs"),
+    }
+    if run['positional']:
+        run['pos_offsets'] = storage.load_array(path, "pos_offsets", mmap=False)
+        run['positions'] = storage.load_array(path, "positions")
+
+    return run
+
+
+# Splits an iterable of documents into lists of batch_size documents
+def _batches(documents, batch_size):
+    documents = iter(documents)
+    while True:
+        batch = list(islice(documents, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+##
+# Worker task, indexes a batch of documents into one or more runs.
+#
+# @return List of the run directories written, in document order.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def _index_batch(batch_no, batch, spill_dir, max_postings, positional, analyzer):
+    runs = []
+    I = InvertedIndex(positional=positional, analyzer=analyzer)
+    postings = 0
+
+    for document in batch:
+        postings += len(I.add_document(document))
+        if postings >= max_postings:
+            runs.append(_spill(I, spill_dir, batch_no, len(runs)))
+            I = InvertedIndex(positional=positional, analyzer=analyzer)
+            postings = 0
+
+    if I.get_total_docs():
+        runs.append(_spill(I, spill_dir, batch_no, len(runs)))
+
+    return runs
+
+
+# Sorts a partial index and writes it out as a run
+def _spill(I, spill_dir, batch_no, part):
+    I.finalize()
+
+    path = os.path.join(spill_dir, "run-{0:08d}-{1:04d}".format(batch_no, part))
+    I.save(path)
+
+    return path
@@ -0,0 +1,243 @@
+##
+# Opt-in instrumentation of the index and query paths.
+#
+# Instrumented code reports through three calls:
+#
+#   stage(name)        - context manager timing a stage into the latency
+#                        histogram of that name
+#   count(name, n)     - adds n to a counter (e.g. postings touched)
+#   gauge(name, value) - records the current value of a size
+#
+# Nothing is recorded until enable() is called; while disabled stage()
+# returns a shared do-nothing context manager and count()/gauge() return
+# straight away, so the cost is a function call and a flag test.
+#
+# snapshot() returns every counter, gauge and histogram as a dictionary
+# (to_json() as JSON).  Independently of enable(), a
+#
+#   with trace() as t:
+#       ss.rank_documents(...)
+#
+# block records the stages and counts of the calls made inside it in the
+# current thread, in order, in t.
+#
+# Stage names used: index.tokenize, index.postings, index.finalize,
+# query.tokenize, query.fold_in, query.score, query.rank, lexical.search.
+# Counter names: index.documents, index.tokens, query.queries,
+# query.terms, query.unknown_terms, query.documents_scored,
+# lexical.postings.  Gauges: index.terms, index.docs, index.postings,
+# space.terms, space.docs.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Whether stages, counters and gauges are recorded
+enabled = False
+
+# Number of active traces (in any thread), stages are timed while > 0
+_tracing = 0
+
+_lock = threading.Lock()
+_local = threading.local()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+class Histogram:
+    # Upper bound of the first bucket, each next bucket doubles it
+    BASE = 1e-6
+    BUCKETS = 32
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+
+    # Records one latency in seconds
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        b = 0 if seconds <= self.BASE else min(int(math.log2(seconds / self.BASE)) + 1, self.BUCKETS - 1)
+        self.buckets[b] += 1
+
+    # Approximate quantile q (0..1): upper bound of the bucket holding it
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.BASE * 2 ** b, self.max)
+
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_s': self.total / self.count if self.count else None,
+            'min_s': self.min if self.count else None,
+            'max_s': self.max if self.count else None,
+            'p50_s': self.quantile(0.5),
+            'p90_s': self.quantile(0.9),
+            'p99_s': self.quantile(0.99),
+        }
+
+
+class Trace:
+    def __init__(self):
+        # (stage name, seconds) in the order the stages finished
+        self.stages = []
+        self.counts = {}
+
+    def to_dict(self):
+        return {
+            'stages': [{'name': name, 'seconds': seconds} for name, seconds in self.stages],
+            'counts': dict(self.counts),
+        }
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+# Context manager timing a stage, does nothing unless enabled or tracing
+def stage(name):
+    if not enabled and not _tracing:
+        return _NULL_STAGE
+
+    return _Stage(name)
+
+
+# Records the latency of a stage
+def observe(name, seconds):
+    if enabled:
+        with _lock:
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    t = getattr(_local, 'trace', None)
+    if t is not None:
+        t.stages.append((name, seconds))
+
+
+# Adds n to a counter
+def count(name, n=1):
+    if not enabled and not _tracing:
+        return
+
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+    t = getattr(_local, 'trace', None)
+    if t is not None:
+        t.counts[name] = t.counts.get(name, 0) + n
+
+
+# Sets a gauge to its current value
+def gauge(name, value):
+    if enabled:
+        _gauges[name] = value
+
+
+##
+# Records the stages and counts of the calls made in the block, in this
+# thread, whether or not instrumentation is enabled.
+#
+# @return Trace object, filled in as the block runs.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+@contextmanager
+def trace():
+    global _tracing
+
+    outer = getattr(_local, 'trace', None)
+    t = Trace()
+    _local.trace = t
+    with _lock:
+        _tracing += 1
+    try:
+        yield t
+    finally:
+        with _lock:
+            _tracing -= 1
+        _local.trace = outer
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+# Drops everything recorded so far
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+# Returns the counters, gauges and stage histograms as a dictionary
+def snapshot():
+    with _lock:
+        return {
+            'enabled': enabled,
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+            'stages': {name: h.to_dict() for name, h in _histograms.items()},
+        }
+
+
+# Returns snapshot() as a JSON string
+def to_json(indent=1):
+    return json.dumps(snapshot(), indent=indent)
@@ -4,31 +4,37 @@
 # Inverted index.  Keeps track of terms and the documents they occur in
 # as well as count (posting lists).
 #
-# Uses a simple linked list data structure internally.  Not super efficient
-# but good for experimentation.
+# Uses compact array backed postings lists internally (see postings.py).
 #
 # Revision History:
 # ~~~~~~~~~~~~~~~~~
 # 07/10/2019 - Created (CJL).
+# 18/10/2026 - Replaced linked list postings with Postings arrays.
 ###
 
-from linked_list import LinkedList
+import numpy as np
+from scipy import sparse
+
+import instrumentation
+import storage
+from analyzer import Analyzer
+from codec import CompressedPostings
+from postings import Postings, PositionalPostings
 
 
 class InvertedIndex:
     ##
     # Constructor
     #
-    # No parameters required.  Simply creates an empty linked list and
+    # No parameters required.  Simply creates an empty terms list and
     # documentID list for tracking of items posted to the index.
     #
     # The index itself is made up of the terms list described above.
     # Each terms list entry consists of an ordered pair.
     # term[i] = (a, b)
     #           a - Word indexed
-    #           b - Linked list containing list data items
-    #               Each data item is of the form (c, d)
-    #               c - document identifier
+    #           b - Postings list containing items of the form (c, d)
+    #               c - document ordinal (index into the docs list)
     #               d - Term frequency of term a in document c.
     # The terms list is kept sorted on the term value
     #
@@ -36,24 +42,63 @@ class InvertedIndex:
     # the InvertedIndex to be indexed.  This list is also kept sorted.
     # Useful for generating sorted output.
     #
+    # Alongside the terms list we keep a lexicon, a dictionary mapping each
+    # word to its index (term id) in the terms list, so a term lookup is a
+    # single hash probe instead of a scan.  Sorting is deferred: documents
+    # are appended as they arrive and both lists are sorted once by
+    # finalize().  Term ids and document ordinals are stable between calls
+    # to finalize().  finalize() only renumbers them when terms or
+    # documents arrived out of sorted order, and then increments
+    # generation, so anything holding ids or ordinals (e.g. a
+    # SemanticSpace's document columns) can tell they are stale.
+    #
+    # @param positional - If True the token offsets of every occurrence
+    #                     are recorded as well (PositionalPostings), as
+    #                     needed for phrase queries.
+    # @param analyzer   - Analyzer used by process_text, whitespace split
+    #                     and lower casing by default.
+    #
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 07/10/2019 - Created (CJL).
+    # 18/10/2026 - Added lexicon and deferred sorting.
+    # 18/10/2026 - Postings store document ordinals.
+    # 18/10/2026 - Optional positional postings.
+    # 18/10/2026 - Configurable analyzer.
     ###
-    def __init__(self):
+    def __init__(self, positional=False, analyzer=None):
         # We need to keep track of the list of terms we are dealing with
         # Each word will be listed as a tuple
-        # (x, y) = x is the word, y is a linked list containing lists
-        #          The linked list data item is a list of the form [a, b]
-        #          [a, b] = a - document identifier, b term frequency of term x
-        #                   in document a.
+        # (x, y) = x is the word, y is a Postings list of pairs (a, b)
+        #          a - document ordinal, b term frequency of term x
+        #          in document a.
         self.terms = []
 
-        # We need to keep track of the documents we have had added
-        # Note, in practice you would use an ordinal value to represent the
-        # document, not necessarily a text name.
+        # Maps each word to its index in the terms list (its term id)
+        self.lexicon = {}
+
+        # We need to keep track of the documents we have had added.  The
+        # postings refer to a document by its ordinal, its index in this list.
         self.docs = []
 
+        # Maps each document identifier to its ordinal in the docs list
+        self.doc_index = {}
+
+        # True when terms/docs are sorted and the lookup tables are current
+        self.finalized = True
+
+        # Number of times finalize() has renumbered term ids or ordinals
+        self.generation = 0
+
+        # Whether token offsets are recorded in the postings
+        self.positional = positional
+
+        # Whether the postings are CompressedPostings (read-only)
+        self.compressed = False
+
+        # Text processing shared by indexing and queries
+        self.analyzer = analyzer if analyzer is not None else Analyzer()
+
     ##
     # Adds a document to the InvertedIndex class.
     #
@@ -61,48 +106,151 @@ class InvertedIndex:
     #                   a - Document identifier (to go in docs list)
     #                   b - String containing document content to be parsed
     #
+    # @return Dictionary of the document's term frequencies.
+    #
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 08/10/2019 - Created (CJL).
+    # 18/10/2026 - Returns the term frequencies.
     ###
     def add_document(self, document):
+        if self.compressed:
+            raise TypeError("Cannot add documents to a compressed InvertedIndex, call decompress() first")
+
         doc_id = document[0]
         text = document[1]
 
         # Tokenize and process text.  This is where any text pre-processing
         # will take place.
-        p_text = self.process_text(text)
+        with instrumentation.stage('index.tokenize'):
+            p_text = self.process_text(text)
+        instrumentation.count('index.documents')
+        instrumentation.count('index.tokens', len(p_text))
+
+        # New documents get the next ordinal so every postings list stays
+        # in increasing ordinal order
+        ordinal = len(self.docs)
+        self.doc_index[doc_id] = ordinal
         self.docs.append(doc_id)
 
-        # Sorts doc identifiers after every addition, in practice you'd
-        # only do this after everything is added if at all
-        self.docs.sort()
-
-        # At this point we have our document identifier and a processed
-        # list of terms, we can now start inserting this into our postings
-        # list LinkedList structure
-        for t in p_text:
-            # For each term
-            trm, x = self.search_for_term(t)
-            if trm is None:
-                # New term
-                ll = LinkedList()
-                ll.insert_at_end([doc_id, 1])
-                self.terms.append((t, ll))
-            else:
-                ll = trm[1]
-                # Check if document already exists in this linked list
-                lt = ll.search(doc_id, lambda x, y: x[0] == y)
-                if lt is None:
-                    ll.insert_at_end([doc_id, 1])
+        # Count the term frequencies for this document first so each term
+        # only touches its postings list once.  Dictionaries keep insertion
+        # order so postings are still added in order of first occurrence.
+        counts = {}
+        positions = {}
+        if self.positional:
+            for n, t in enumerate(p_text):
+                positions.setdefault(t, []).append(n)
+            counts = {t: len(p) for t, p in positions.items()}
+        else:
+            for t in p_text:
+                counts[t] = counts.get(t, 0) + 1
+
+        # At this point we have our document identifier and the term
+        # frequencies, we can now start inserting this into our postings
+        # list structure
+        with instrumentation.stage('index.postings'):
+            for t, tf in counts.items():
+                i = self.lexicon.get(t)
+                if i is None:
+                    # New term, its term id is its position in the terms list
+                    postings = PositionalPostings() if self.positional else Postings()
+                    self.lexicon[t] = len(self.terms)
+                    self.terms.append((t, postings))
+                else:
+                    postings = self.terms[i][1]
+
+                if self.positional:
+                    postings.add(ordinal, tf, positions[t])
                 else:
-                    # Increment term frequency
-                    lt[1] += 1
+                    postings.add(ordinal, tf)
+
+        # Sorting is deferred until finalize() is called
+        self.finalized = False
+
+        return counts
+
+    ##
+    # Sorts the terms and docs lists and rebuilds the lexicon and
+    # document lookup tables.
+    #
+    # Call this once you have finished populating the inverted index.
+    # The matrix and printing methods call it for you.  Note that term
+    # ids and document ordinals are renumbered by this call if terms or
+    # documents were added out of order, which increments generation.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    # 18/10/2026 - Renumbers document ordinals in the postings lists.
+    # 18/10/2026 - Generation counter.
+    ###
+    def finalize(self):
+        if self.finalized:
+            return
+
+        with instrumentation.stage('index.finalize'):
+            self._finalize()
+
+        if instrumentation.enabled:
+            instrumentation.gauge('index.terms', self.get_total_terms())
+            instrumentation.gauge('index.docs', self.get_total_docs())
+            instrumentation.gauge('index.postings', sum(len(t[1]) for t in self.terms))
 
-        # Sort the terms in our term list
-        # Sorts after every addition, in practice you'd only sort once
-        # you have populated the inverted index.
-        self.terms.sort(key=lambda tup: tup[0])
+    def _finalize(self):
+        renumbered = False
+
+        # Terms and documents only need renumbering if they arrived out
+        # of order
+        order = sorted(range(len(self.terms)), key=lambda i: self.terms[i][0])
+        if order != list(range(len(self.terms))):
+            self.terms = [self.terms[i] for i in order]
+            self.lexicon = {t[0]: i for i, t in enumerate(self.terms)}
+            renumbered = True
+
+        order = sorted(range(len(self.docs)), key=self.docs.__getitem__)
+        if order != list(range(len(self.docs))):
+            mapping = np.empty(len(order), dtype=np.int32)
+            mapping[order] = np.arange(len(order), dtype=np.int32)
+            for t in self.terms:
+                t[1].remap(mapping)
+
+            self.docs = [self.docs[j] for j in order]
+            self.doc_index = {d: j for j, d in enumerate(self.docs)}
+            renumbered = True
+
+        if renumbered:
+            self.generation += 1
+        self.finalized = True
+
+    ##
+    # Replaces every postings list with its compressed form (see codec.py),
+    # typically a quarter or less of the memory.  The index is finalized
+    # first and becomes read-only until decompress() is called.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def compress(self):
+        if self.compressed:
+            return
+        if self.positional:
+            raise ValueError("Positional postings cannot be compressed")
+
+        self.finalize()
+        self.terms = [(t, CompressedPostings.from_postings(p)) for t, p in self.terms]
+        self.compressed = True
+
+    # Restores the uncompressed Postings lists
+    def decompress(self):
+        if not self.compressed:
+            return
+
+        self.terms = [(t, Postings.from_arrays(*p.decode())) for t, p in self.terms]
+        for t in self.terms:
+            t[1]._make_writable()
+        self.compressed = False
 
     ##
     # Given the state of the inverted index generate a term by document
@@ -120,80 +268,187 @@ class InvertedIndex:
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 08/10/2019 - Created (CJL).
+    # 18/10/2026 - Single pass over the postings lists.
     ###
     def generate_term_by_doc_matrix(self):
+        self.finalize()
+
         total_docs = self.get_total_docs()
         total_terms = self.get_total_terms()
 
         # We need to create a total_terms X total_docs matrix
         A = [[0.0 for i in range(total_docs)] for j in range(total_terms)]
 
-        for t in self.terms:
-            # Get terms postings linked list
-            ll = t[1]
-            for d in self.docs:
-                # If our current document is in postings list add it to matrix
-                item = ll.search(d, lambda x, y: x[0] == y)
-                if item is not None:
-                    i = self.terms.index(t)
-                    j = self.docs.index(d)
-                    A[i][j] = item[1]
+        for i, t in enumerate(self.terms):
+            # Walk the terms postings list
+            for d, tf in t[1]:
+                A[i][d] = tf
 
         return A
 
+    ##
+    # Sparse version of generate_term_by_doc_matrix.  Rows and columns
+    # are the same but only the non zero entries are stored, built in a
+    # single pass over the postings lists.
+    #
+    # The postings lists are already in CSR layout: row i is terms[i],
+    # its column indices are the document ordinals and its values are
+    # the term frequencies.
+    #
+    # @param fmt - Sparse format to return, 'csr' (default) or 'csc'.
+    #
+    # @return A - scipy.sparse total_terms X total_docs matrix of floats.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def generate_sparse_term_by_doc_matrix(self, fmt='csr'):
+        self.finalize()
+
+        shape = (self.get_total_terms(), self.get_total_docs())
+
+        lengths = np.fromiter((len(t[1]) for t in self.terms), dtype=np.int64, count=shape[0])
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+
+        # Join the raw array buffers rather than building a NumPy array per term
+        indices = np.frombuffer(b''.join(t[1].doc_ids for t in self.terms), dtype=np.int32)
+        data = np.frombuffer(b''.join(t[1].tfs for t in self.terms), dtype=np.int32)
+
+        A = sparse.csr_matrix((data.astype(np.float64), indices.copy(), indptr), shape=shape)
+        A.has_sorted_indices = True
+
+        return A.asformat(fmt)
+
+    ##
+    # Saves the inverted index to a directory (see storage.py).
+    #
+    # The postings lists are written as three flat arrays: offsets into
+    # the other two per term, the document ordinals and the term
+    # frequencies.  A positional index also writes the positions of all
+    # postings and their offsets per term.  The index is saved as is, it
+    # is not finalized first.
+    #
+    # @param path - Directory to write to, created if needed.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def save(self, path):
+        offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum([len(t[1]) for t in self.terms], out=offsets[1:])
+
+        storage.write_manifest(path, "inverted_index", {
+            "total_terms": self.get_total_terms(),
+            "total_docs": self.get_total_docs(),
+            "finalized": self.finalized,
+            "positional": self.positional,
+            "analyzer": self.analyzer.config(),
+        })
+        storage.save_strings(path, "terms", (t[0] for t in self.terms))
+        storage.save_strings(path, "docs", self.docs)
+        storage.save_array(path, "offsets", offsets)
+        storage.save_array(path, "doc_ids", np.frombuffer(b''.join(t[1].doc_ids for t in self.terms),
+                                                          dtype=np.int32))
+        storage.save_array(path, "tfs", np.frombuffer(b''.join(t[1].tfs for t in self.terms), dtype=np.int32))
+
+        if self.positional:
+            pos_offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+            np.cumsum([len(t[1].positions) for t in self.terms], out=pos_offsets[1:])
+            storage.save_array(path, "pos_offsets", pos_offsets)
+            storage.save_array(path, "positions", np.frombuffer(b''.join(t[1].positions for t in self.terms),
+                                                                dtype=np.int32))
+
+    ##
+    # Loads an inverted index written by save.
+    #
+    # @param path - Directory to read from.
+    # @param mmap - If True the postings arrays are memory mapped
+    #               read-only rather than read into memory.  They are
+    #               copied on the first change to a postings list.
+    #
+    # @return InvertedIndex object.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    @classmethod
+    def load(cls, path, mmap=True):
+        manifest = storage.read_manifest(path, "inverted_index")
+
+        offsets = storage.load_array(path, "offsets", mmap=False)
+        doc_ids = storage.load_array(path, "doc_ids", mmap)
+        tfs = storage.load_array(path, "tfs", mmap)
+
+        I = cls(positional=manifest.get("positional", False),
+                analyzer=Analyzer.from_config(manifest.get("analyzer")))
+        words = storage.load_strings(path, "terms")
+        I.terms = [(w, Postings.from_arrays(doc_ids[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]]))
+                   for i, w in enumerate(words)]
+
+        if I.positional:
+            pos_offsets = storage.load_array(path, "pos_offsets", mmap=False)
+            positions = storage.load_array(path, "positions", mmap)
+            I.terms = [(w, PositionalPostings.from_arrays(p.doc_ids, p.tfs,
+                                                          positions[pos_offsets[i]:pos_offsets[i + 1]]))
+                       for i, (w, p) in enumerate(I.terms)]
+        I.lexicon = {w: i for i, w in enumerate(words)}
+        I.docs = storage.load_strings(path, "docs")
+        I.doc_index = {d: j for j, d in enumerate(I.docs)}
+        I.finalized = manifest["finalized"]
+
+        return I
+
     ##
     # This is the method that processes a string of text to be added to
     # the postings list.
     #
-    # Typically much more would go on here.  This is the place where one
-    # would perform operations such as:
-    #  * stop word removal
-    #  * lower casing of text
-    #  * stemming or lemmatisation
-    #  * any other case specific processing that needs to happen.
+    # The work is done by the index's Analyzer (see analyzer.py), which is
+    # where stop word removal, lower casing, stemming and any other case
+    # specific processing are configured.  Queries go through the same
+    # call, so they are processed the same way as the indexed text.
     #
     # @param text - String of text to be added to inverted index
     #
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 08/10/2019 - Created (CJL).
+    # 18/10/2026 - Delegates to the analyzer.
     ###
     def process_text(self, text):
-        # We are just going to trivially split on whitespace
-        t = text.split()
-
-        # Then we will lowercase everything
-        t = [item.lower() for item in t]
-
-        # Any other text pre-processing would take place here
-
-        return t
+        return self.analyzer.analyze(text)
 
     ##
-    # Crude linear search for the presence of a term in the inverted
-    # index.  Just traverses the terms list for a match.
+    # Search for the presence of a term in the inverted index.  Looks the
+    # term up in the lexicon.
     #
     # @param t - Term to search for.
     #
     # @return w - The word ordered pair if found.  Remember this takes the
     #             form (a, b) where:
     #             a - Term we were searching for (match)
-    #             b - Index of the term in the internal words list.
-    #                 This is useful when generating matrix output as often
-    #                 we will need to know the "row" this corresponds to.
+    #             b - Postings list of the term.
     #         i - Index of w in the terms array.  Useful for using as an index into
     #             a term by document matrix.
     #
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 09/10/2019 - Created (CJL).
+    # 18/10/2026 - Lexicon lookup instead of a linear scan.
     ###
     def search_for_term(self, t):
-        for w in self.terms:
-            if w[0] == t:
-                return w, self.terms.index(w)
+        i = self.lexicon.get(t)
+        if i is None:
+            return None, None
+
+        return self.terms[i], i
 
-        return None, None
+    # Returns the term id (index in the terms list) of a term, or None
+    def get_term_id(self, t):
+        return self.lexicon.get(t)
 
     # Returns total number of terms in our inverted index
     def get_total_terms(self):
@@ -226,7 +481,8 @@ class InvertedIndex:
 
     # Prints the individual postings lists
     def print(self):
+        self.finalize()
         for t in self.terms:
-            llist = t[1]
             print(t[0])
-            llist.print_list()
+            for d, tf in t[1]:
+                print([self.docs[d], tf])
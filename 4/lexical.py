@@ -0,0 +1,207 @@
+##
+# Lexical (BM25 / TF-IDF) top-k ranking straight over the postings of an
+# InvertedIndex, without building the term by document matrix.
+#
+# The score of every posting and the largest score of every term (its
+# upper bound) are computed once when the scorer is built.  Queries are
+# then evaluated document-at-a-time with MaxScore dynamic pruning
+# (Turtle & Flood, 1995): terms are ordered by upper bound and, once the
+# top-k heap is full, the terms whose upper bounds together cannot lift
+# a document above the current k-th score become "non-essential".
+# Only the postings of the essential terms drive the traversal, the
+# others are probed (galloping search) for candidates that can still
+# make the top k.  The work done therefore depends on the postings
+# touched rather than on the size of the collection.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+import instrumentation
+
+
+class LexicalScorer:
+    ##
+    # Constructor
+    #
+    # Precomputes the per posting scores and per term upper bounds.
+    # Build it once the index is complete (and finalized if you want to
+    # compare ordinals with a SemanticSpace built from the same index).
+    #
+    # The scorer is a snapshot of the index: it keeps its own copy of the
+    # postings documents, the lexicon and the document identifiers, so
+    # documents added to the index later, or a later finalize(), do not
+    # affect it.  Build a new scorer to include them.
+    #
+    # @param I      - InvertedIndex to score.
+    # @param scheme - 'bm25' or 'tfidf' ((1 + log tf) * log(N / df)).
+    # @param k1     - BM25 term frequency saturation.
+    # @param b      - BM25 document length normalisation.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, I, scheme='bm25', k1=1.2, b=0.75):
+        if scheme not in ('bm25', 'tfidf'):
+            raise ValueError("Unknown scheme '" + str(scheme) + "', expected 'bm25' or 'tfidf'")
+
+        self.I = I
+        self.scheme = scheme
+        self.k1 = k1
+        self.b = b
+
+        total_docs = I.get_total_docs()
+        lengths = np.fromiter((len(t[1]) for t in I.terms), dtype=np.int64, count=I.get_total_terms())
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        doc_ids = np.frombuffer(b''.join(t[1].doc_ids for t in I.terms), dtype=np.int32)
+        tfs = np.frombuffer(b''.join(t[1].tfs for t in I.terms), dtype=np.int32).astype(np.float64)
+        df = np.repeat(lengths, lengths).astype(np.float64)
+
+        # Document lengths (indexed tokens) from one pass over the postings
+        self.doc_lengths = np.bincount(doc_ids, weights=tfs, minlength=total_docs)
+
+        if scheme == 'bm25':
+            avg_length = self.doc_lengths.mean() if total_docs else 0.0
+            idf = np.log1p((total_docs - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * self.doc_lengths[doc_ids] / (avg_length or 1.0))
+            scores = idf * tfs * (k1 + 1.0) / (tfs + norm)
+        else:
+            scores = (1.0 + np.log(tfs)) * np.log(total_docs / df)
+
+        scores = scores.astype(np.float32)
+
+        # Term ids and document identifiers as of now
+        self.lexicon = dict(I.lexicon)
+        self.docs = list(I.docs)
+
+        # Per term: postings documents (copied), posting scores and upper
+        # bound
+        self.doc_ids = [array('i', doc_ids[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(lengths))]
+        self.scores = [array('f', scores[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(lengths))]
+        self.upper_bounds = np.zeros(len(lengths))
+        nonempty = lengths > 0
+        if nonempty.any():
+            self.upper_bounds[nonempty] = np.maximum.reduceat(scores, offsets[:-1][nonempty])
+
+    ##
+    # Finds the top_k documents for a query.
+    #
+    # @param query - Query string, processed like the indexed text.  A term
+    #                repeated in the query counts that many times.
+    # @param top_k - Number of documents to return.
+    #
+    # @return ids    - NumPy array of up to top_k document ordinals, best first.
+    #         scores - NumPy array of their scores.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def search(self, query, top_k=10):
+        with instrumentation.stage('lexical.search'):
+            ids, scores, touched = self._search(query, top_k)
+        instrumentation.count('lexical.postings', touched)
+
+        return ids, scores
+
+    # MaxScore evaluation for search, also returns the number of postings
+    # the cursors moved over
+    def _search(self, query, top_k):
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0), 0
+
+        weights = {}
+        for t in self.I.process_text(query):
+            i = self.lexicon.get(t)
+            if i is not None:
+                weights[i] = weights.get(i, 0) + 1
+
+        # Query terms in increasing order of their (weighted) upper bound
+        terms = sorted(weights, key=lambda i: self.upper_bounds[i] * weights[i])
+        docs = [self.doc_ids[i] for i in terms]
+        scores = [self.scores[i] for i in terms]
+        weight = [weights[i] for i in terms]
+        lengths = [len(d) for d in docs]
+
+        # bound[i] - most terms 0..i together can add to a document's score
+        bound = []
+        total = 0.0
+        for i in terms:
+            total += float(self.upper_bounds[i]) * weights[i]
+            bound.append(total)
+
+        n = len(terms)
+        cursors = [0] * n
+        heap = []
+        threshold = -math.inf
+        essential = 0
+
+        while essential < n:
+            # Next document is the smallest one under an essential cursor
+            d = None
+            for i in range(essential, n):
+                if cursors[i] < lengths[i] and (d is None or docs[i][cursors[i]] < d):
+                    d = docs[i][cursors[i]]
+            if d is None:
+                break
+
+            score = 0.0
+            for i in range(essential, n):
+                c = cursors[i]
+                if c < lengths[i] and docs[i][c] == d:
+                    score += scores[i][c] * weight[i]
+                    cursors[i] = c + 1
+
+            # Non-essential terms, largest bound first, while d can still
+            # make the top k
+            for i in range(essential - 1, -1, -1):
+                if score + bound[i] <= threshold:
+                    break
+                c = _gallop(docs[i], d, cursors[i], lengths[i])
+                cursors[i] = c
+                if c < lengths[i] and docs[i][c] == d:
+                    score += scores[i][c] * weight[i]
+            else:
+                entry = (score, -d)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+                if len(heap) == top_k and heap[0][0] > threshold:
+                    threshold = heap[0][0]
+                    while essential < n and bound[essential] <= threshold:
+                        essential += 1
+
+        best = sorted(heap, reverse=True)
+
+        return np.array([-d for _, d in best], dtype=np.int32), np.array([s for s, _ in best]), sum(cursors)
+
+    # Same as search, but returns (document identifier, score) pairs
+    def documents(self, query, top_k=10):
+        ids, scores = self.search(query, top_k)
+
+        return [(self.docs[d], s) for d, s in zip(ids, scores)]
+
+
+# First index >= lo at which docs[index] >= d, by galloping from lo
+def _gallop(docs, d, lo, n):
+    step = 1
+    hi = lo
+    while hi < n and docs[hi] < d:
+        lo = hi + 1
+        hi += step
+        step *= 2
+
+    return bisect_left(docs, d, lo, min(hi + 1, n))
@@ -0,0 +1,69 @@
+##
+# Bounded least recently used cache with hit/miss/eviction counters.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    ##
+    # Constructor
+    #
+    # @param maxsize - Most entries held, the least recently used entry is
+    #                  evicted beyond that.  0 disables the cache.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Returns the cached value (marking it recently used) or None
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    # Caches a value, evicting the least recently used entry if full
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    # Drops every entry, the counters are kept
+    def clear(self):
+        self.entries.clear()
+
+    # Returns the counters as a dictionary
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self):
+        return len(self.entries)
@@ -4,6 +4,7 @@
 ###
 
 # from utilities import read_text_file_whole
+from ingest import iter_documents
 from inverted_index import InvertedIndex
 from semantic_space import SemanticSpace
 
@@ -20,6 +21,9 @@ def main():
     for d in documents:
         inv_ind.add_document(d)
 
+    # Sort the terms and documents once now that everything is added
+    inv_ind.finalize()
+
     # Create our semantic space and SVD computation
     ss = SemanticSpace(inv_ind)
 
@@ -29,22 +33,35 @@ def main():
 
     # This loop prints out the similarity scores between each document
     # and our query vector - results should match those of class.
-    # TODO:  Complete cosine_with_doc method
     print("Showing similarities between our query and documents in semantic space")
-    for i in range(9):
-        print(inv_ind.docs[i] + ": " + '{0:0.3f}'.format(ss.cosine_with_doc(q, i)))
+    scores = ss.score_documents(q, folded=True)[0]
+    for i in range(inv_ind.get_total_docs()):
+        print(inv_ind.docs[i] + ": " + '{0:0.3f}'.format(scores[i]))
+
+    print()
+
+    # Ranking a batch of queries at once
+    print("Top 3 documents per query")
+    queries = ["Human Computer Interaction", "graph minors trees"]
+    ids, top = ss.rank_documents(queries, top_k=3)
+    for query, row, row_scores in zip(queries, ids, top):
+        print(query + ": " + ", ".join(inv_ind.docs[j] + ' ({0:0.3f})'.format(s) for j, s in zip(row, row_scores)))
 
     print()
 
     # This code snippet iterates through every pair of terms in our semantic
     # space printing out the similarities (cosine) score of each pair.
-    # TODO:  Complete cosine_with_term method
     print("Showing similarity between all terms with one another")
-    for i in range(12):
-        print("Similarity with " + inv_ind.terms[i][0])
-        for j in range(12):
-            print('{0: >10}'.format(inv_ind.terms[j][0]) + ": " + '{0:0.3f}'.format(ss.cosine_with_term(i, j)))
-        print()
+    for start, block in ss.term_similarity_blocks():
+        for n, row in enumerate(block):
+            print("Similarity with " + inv_ind.terms[start + n][0])
+            for j in range(inv_ind.get_total_terms()):
+                print('{0: >10}'.format(inv_ind.terms[j][0]) + ": " + '{0:0.3f}'.format(row[j]))
+            print()
+
+    print("Terms most similar to 'trees'")
+    for term, cos in ss.similar_terms("trees", top_k=3):
+        print('{0: >10}'.format(term) + ": " + '{0:0.3f}'.format(cos))
 
 
 #####
@@ -63,16 +80,12 @@ def main():
 # @return - List containing ordered pairs (a, b)
 #           a - corresponds to document name
 #           b - corresponds to the text of the document as a string
+#
+# For large folders use ingest.iter_documents, which yields the documents
+# one at a time, with ingest.build_index.
 ###
 def read_data(folder):
-    import os
-
-    documents = []
-    for file in os.listdir(folder):
-        if file.endswith(".txt"):
-            documents.append((file.rsplit('.', 1)[0], (read_text_file_whole(folder + "/" + file))))
-
-    return documents
+    return list(iter_documents(folder))
 
 
 ##
@@ -0,0 +1,266 @@
+##
+# Postings
+#
+# Compact postings list for the inverted index.  Replaces the linked list
+# of [doc_id, tf] lists with two contiguous typed arrays:
+#
+#   doc_ids[n] - ordinal of the document of the n-th posting
+#   tfs[n]     - term frequency of the term in that document
+#
+# Documents are referred to by their ordinal (index into the inverted
+# index docs list) rather than their name.  Postings are appended in
+# increasing ordinal order, so the "same document as the last posting"
+# check is a single comparison against the end of the array.
+#
+# Each posting costs 8 bytes instead of the three Python objects (node,
+# list and boxed ints) the linked list needed.
+#
+# A postings list loaded from disk holds read-only NumPy arrays (views of
+# a memory mapped file) instead.  These are copied into writable arrays
+# the first time the list is modified.
+#
+# PositionalPostings additionally records the token offsets of every
+# occurrence, for phrase queries.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+
+class Postings:
+    __slots__ = ('doc_ids', 'tfs')
+
+    ##
+    # Constructor
+    #
+    # Creates an empty postings list.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self):
+        self.doc_ids = array('i')
+        self.tfs = array('i')
+
+    ##
+    # Creates a postings list from existing arrays without copying them.
+    #
+    # @param doc_ids - Document ordinals, increasing (int32 array).
+    # @param tfs     - Matching term frequencies (int32 array).
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    @classmethod
+    def from_arrays(cls, doc_ids, tfs):
+        postings = cls()
+        postings.doc_ids = doc_ids
+        postings.tfs = tfs
+
+        return postings
+
+    ##
+    # Adds an occurrence of the term to a document.  If the document is
+    # the same as the last posting its term frequency is incremented,
+    # otherwise a new posting is appended.  Amortized O(1).
+    #
+    # @param doc - Document ordinal, must not be smaller than the last
+    #              document ordinal in this list.
+    # @param tf  - Number of occurrences to add (default 1).
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def add(self, doc, tf=1):
+        if type(self.doc_ids) is not array:
+            self._make_writable()
+
+        if self.doc_ids and self.doc_ids[-1] == doc:
+            self.tfs[-1] += tf
+        else:
+            self.doc_ids.append(doc)
+            self.tfs.append(tf)
+
+    # Returns the document ordinal of the last posting, or None if empty
+    def last_doc(self):
+        return self.doc_ids[-1] if len(self.doc_ids) else None
+
+    ##
+    # Finds the posting of a document with a binary search over the
+    # (increasing) document ordinals.
+    #
+    # @param doc - Document ordinal.
+    # @param lo  - Index of the first posting to consider.
+    #
+    # @return Index of the posting, or -1 if the document does not
+    #         contain the term.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def find(self, doc, lo=0):
+        n = bisect_left(self.doc_ids, doc, lo)
+        if n < len(self.doc_ids) and self.doc_ids[n] == doc:
+            return n
+
+        return -1
+
+    # Returns the document ordinals as a NumPy int32 array (a copy)
+    def doc_array(self):
+        return np.array(self.doc_ids, dtype=np.int32)
+
+    # Returns the term frequencies as a NumPy int32 array (a copy)
+    def tf_array(self):
+        return np.array(self.tfs, dtype=np.int32)
+
+    ##
+    # Renumbers the document ordinals of every posting and restores the
+    # increasing ordinal order.  Used when the inverted index re-sorts
+    # its documents.
+    #
+    # @param mapping - NumPy array, mapping[old_ordinal] = new_ordinal
+    #
+    # @return The permutation applied, new posting n was posting order[n].
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def remap(self, mapping):
+        docs = mapping[self.doc_array()]
+        order = np.argsort(docs, kind='stable')
+
+        self.doc_ids = array('i', docs[order].astype(np.int32).tobytes())
+        self.tfs = array('i', self.tf_array()[order].tobytes())
+
+        return order
+
+    # Copies read-only (e.g. memory mapped) arrays into writable ones
+    def _make_writable(self):
+        self.doc_ids = array('i', np.asarray(self.doc_ids, dtype=np.int32).tobytes())
+        self.tfs = array('i', np.asarray(self.tfs, dtype=np.int32).tobytes())
+
+    # Number of postings (documents containing the term)
+    def __len__(self):
+        return len(self.doc_ids)
+
+    # Iterates over (doc ordinal, term frequency) pairs
+    def __iter__(self):
+        return zip(self.doc_ids, self.tfs)
+
+    # testing function
+    def print_list(self):
+        if not len(self.doc_ids):
+            print("List is empty.")
+        else:
+            for d, tf in self:
+                print([d, tf])
+
+
+class PositionalPostings(Postings):
+    __slots__ = ('positions', '_starts')
+
+    ##
+    # Constructor
+    #
+    # Creates an empty positional postings list.  The positions of all
+    # postings are stored back to back in one array; posting n has tfs[n]
+    # positions, so its slice is found from the running sum of the tfs.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self):
+        super().__init__()
+        self.positions = array('i')
+
+        # Cached start of each posting's positions, rebuilt on demand
+        self._starts = None
+
+    ##
+    # Creates a positional postings list from existing arrays without
+    # copying them.
+    #
+    # @param doc_ids   - Document ordinals, increasing (int32 array).
+    # @param tfs       - Matching term frequencies (int32 array).
+    # @param positions - Token offsets of all postings (int32 array).
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    @classmethod
+    def from_arrays(cls, doc_ids, tfs, positions=None):
+        postings = super().from_arrays(doc_ids, tfs)
+        if positions is not None:
+            postings.positions = positions
+
+        return postings
+
+    ##
+    # Adds occurrences of the term to a document.
+    #
+    # @param doc       - Document ordinal, as for Postings.add.
+    # @param tf        - Number of occurrences, len(positions).
+    # @param positions - Token offsets of the occurrences, increasing.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def add(self, doc, tf=1, positions=()):
+        super().add(doc, tf)
+        self.positions.extend(positions)
+        self._starts = None
+
+    ##
+    # Returns the token offsets of a posting.
+    #
+    # @param n - Index of the posting (not the document ordinal, see find).
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def positions_of(self, n):
+        starts = self._position_starts()
+
+        return self.positions[starts[n]:starts[n + 1]]
+
+    # Renumbers the documents and moves the positions along with them
+    def remap(self, mapping):
+        starts = self._position_starts()
+        order = super().remap(mapping)
+
+        lengths = self.tf_array().astype(np.int64)
+        out_starts = np.cumsum(lengths) - lengths
+        source = np.repeat(starts[:-1][order] - out_starts, lengths) + np.arange(int(lengths.sum()))
+
+        positions = np.asarray(self.positions, dtype=np.int32)[source]
+        self.positions = array('i', positions.tobytes())
+        self._starts = None
+
+        return order
+
+    def _make_writable(self):
+        super()._make_writable()
+        self.positions = array('i', np.asarray(self.positions, dtype=np.int32).tobytes())
+
+    # Start offset of every posting's positions, plus the total at the end
+    def _position_starts(self):
+        if self._starts is None:
+            self._starts = np.zeros(len(self) + 1, dtype=np.int64)
+            np.cumsum(self.tf_array(), out=self._starts[1:])
+
+        return self._starts
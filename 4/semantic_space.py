@@ -7,46 +7,507 @@
 # 08/10/2019 - CJL
 ###
 
+import copy
 import numpy as np  # For SVD Calculation
 import math  # For sqrt function
+from scipy import sparse
+
+import decomposition
+import incremental
+import instrumentation
+import storage
+from analyzer import Analyzer
+from inverted_index import InvertedIndex
+from lru_cache import LRUCache
 
 
 class SemanticSpace:
     ##
     # Constructor
     #
-    # Takes one parameter, I, which is the InvertedIndex that we want to build
-    # a semantic space from.
+    # Takes the InvertedIndex, I, that we want to build a semantic space
+    # from, and optionally the term by document matrix A if it has
+    # already been built.
     #
     # @param I - InvertedIndex object.
+    # @param A - Term by document matrix of I, either a scipy.sparse matrix
+    #            or a dense array/list of lists.  Generated from I as a
+    #            sparse matrix if not given.
+    # @param max_dimension - Dimensional reduction value (value of "k"), the
+    #            number of singular triplets computed and used.
+    # @param svd - Decomposition backend, see decomposition.BACKENDS
+    #            ('dense', 'arpack', 'randomized' or 'auto') or a callable.
+    # @param svd_options - Dictionary of extra keyword arguments for the
+    #            backend, e.g. {'oversamples': 10, 'n_iter': 4} for
+    #            'randomized'.
+    # @param update_policy - incremental.UpdatePolicy used by
+    #            add_documents, the defaults if not given.
+    # @param query_cache_size - Most folded in queries cached.
+    # @param term_cache_size - Most folded in term vectors cached.
+    # @param compact - Memory lean mode: A is dropped once decomposed and
+    #            the factors and derived matrices are kept as contiguous
+    #            float32 (cosines agree with the float64 mode to about
+    #            1e-6).
+    # @param doc_dtype - In compact mode, 'float32' or 'float16' for the
+    #            document vectors.  float16 halves them again at a cosine
+    #            error of a few 1e-4.
     #
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 08/10/2019 - Created (CJL).
+    # 18/10/2026 - A is kept as a sparse matrix.
+    # 18/10/2026 - Pluggable top-k decomposition backends.
+    # 18/10/2026 - Incremental document updates.
+    # 18/10/2026 - Query and term vector caches.
+    # 18/10/2026 - Compact float32 mode.
     ###
-    def __init__(self, I):
+    def __init__(self, I, A=None, max_dimension=2, svd='auto', svd_options=None, update_policy=None,
+                 query_cache_size=4096, term_cache_size=65536, compact=False, doc_dtype='float32'):
+        if doc_dtype not in ('float32', 'float16'):
+            raise ValueError("Unknown doc_dtype '" + str(doc_dtype) + "', expected 'float32' or 'float16'")
+
         # Store the Inverted Index
         self.I = I
 
+        # False for a space loaded without the index it was built from,
+        # whose I only provides the text processing
+        self.has_index = True
+
+        # Set our dimensional reduction value (value of "k")
+        self.max_dimension = max_dimension
+
+        # How the SVD is computed, kept for rebuilds
+        self.svd = svd
+        self.svd_options = svd_options or {}
+
+        self.update_policy = update_policy if update_policy is not None else incremental.UpdatePolicy()
+
+        self.compact = compact
+        self.doc_dtype = doc_dtype
+
+        # Folded in query vectors keyed by their bag of terms, and folded in
+        # term vectors (rows of T S^{-1}) keyed by row.  A query vector is
+        # the sum of its term vectors weighted by term frequency.
+        self.query_cache = LRUCache(query_cache_size)
+        self.term_cache = LRUCache(term_cache_size)
+
+        self.build(A)
+
+    ##
+    # (Re)computes the semantic space from the inverted index.
+    #
+    # The terms (rows of T) and documents (columns of Dt) of the space
+    # are copied from the index at this point, so the space stays
+    # consistent while more documents are added to the index.
+    #
+    # @param A - Term by document matrix of I, generated from I if None.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created, from the constructor.
+    ###
+    def build(self, A=None):
+        self._check_index()
+
         # Generate our term by document matrix "A"
-        self.A = self.I.generate_term_by_doc_matrix()
+        if A is None:
+            A = self.I.generate_sparse_term_by_doc_matrix()
+        elif not sparse.issparse(A):
+            A = sparse.csr_matrix(np.asarray(A, dtype=np.float64))
+        self.A = A
+
+        # Words of the rows of T, their row lookup and the documents of the
+        # columns of Dt
+        self.I.finalize()
+        self.terms = [t[0] for t in self.I.terms]
+        self.term_index = dict(self.I.lexicon)
+        self.docs = list(self.I.docs)
+        self._column_key = None
 
         # Output from our SVD operation
         self.T = None
         self.S = None
         self.Dt = None
 
-        # Perform the SVD operation on A
-        self.T, self.S, self.Dt = np.linalg.svd(self.A, full_matrices=False)
+        # Perform the SVD operation on A, only the top k singular
+        # triplets are computed
+        decompose = decomposition.get_backend(self.svd)
+        self.T, self.S, self.Dt = decompose(self.A, self.max_dimension, **self.svd_options)
+
+        # Drift bookkeeping for documents added after this decomposition
+        self.base_docs = len(self.docs)
+        self.folded_docs = 0
+        self.updated_docs = 0
+        self.folded_residual = 0.0
+        self.folded_terms = 0
+        self.unknown_terms = 0
+        self.base_residual = float(np.mean(incremental.projection_residuals(self.T, self.A))) \
+            if self.base_docs else 0.0
+
+        # A is regenerated from the index on a rebuild
+        if self.compact:
+            self.A = None
+
+        self._compute_derived()
+
+        instrumentation.gauge('space.terms', len(self.terms))
+        instrumentation.gauge('space.docs', len(self.docs))
+
+    ##
+    # Computes everything derived from T, S and Dt.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created, from the constructor.
+    ###
+    def _compute_derived(self):
+        # Anything cached was computed from the old factors
+        self.clear_caches()
+
+        k = self.max_dimension
+        if self.compact:
+            # Only the rank k factors are kept, as contiguous float32
+            self.T = np.ascontiguousarray(self.T[:, :k], dtype=np.float32)
+            self.S = np.ascontiguousarray(self.S[:k], dtype=np.float32)
+            self.Dt = np.ascontiguousarray(self.Dt[:k, :], dtype=np.float32)
 
+        self._compute_scales()
+
+        # Document vectors scaled by S and normalized to unit length, one
+        # row per document.  Cosines against a batch of queries are then a
+        # single matrix multiply.
+        self.doc_vectors = normalize_rows(self.Dt[:k, :].T * self.S[:k])
+
+        # Same for the terms, rows of T scaled by S and normalized, so the
+        # cosine between two terms is a dot product of two rows.
+        self.term_vectors = normalize_rows(self.T[:, :k] * self.S[:k])
+
+        if self.compact:
+            self.doc_vectors = self.doc_vectors.astype(self.doc_dtype)
+            self.term_vectors = self.term_vectors.astype(np.float32)
+
+    # Computes S_inv and S_sq from S
+    def _compute_scales(self):
         # Create a prefabricated inverse of the singular values as well
         # as the squares.
         # (shortcut for operations - can you see how they would help?)
-        self.S_inv = [1.0 / x for x in self.S]
+        # Zero singular values (rank deficient A) get a zero inverse.
+        self.S_inv = [1.0 / x if x > 0 else 0.0 for x in self.S]
         self.S_sq = [x * x for x in self.S]
 
-        # Set our dimensional reduction value default (value of "k")
-        self.max_dimension = 2
+        if self.compact:
+            self.S_inv = np.array(self.S_inv, dtype=np.float32)
+            self.S_sq = np.array(self.S_sq, dtype=np.float32)
+
+    # Bytes held by the matrices of the space (A included, if kept)
+    def nbytes(self):
+        total = sum(getattr(self, name).nbytes for name in ("T", "S", "Dt", "term_vectors", "doc_vectors"))
+        if self.A is not None:
+            total += self.A.data.nbytes + self.A.indices.nbytes + self.A.indptr.nbytes
+
+        return total
+
+    # Empties the query and term vector caches
+    def clear_caches(self):
+        self.query_cache.clear()
+        self.term_cache.clear()
+
+    # Returns the hit/miss/eviction counters of the caches
+    def cache_stats(self):
+        return {'queries': self.query_cache.stats(), 'terms': self.term_cache.stats()}
+
+    ##
+    # Adds documents to the inverted index and to the semantic space
+    # without a full recompute.
+    #
+    # Depending on the update policy the documents are either folded in
+    # (appended to Dt, T and S unchanged) or an incremental SVD update is
+    # performed.  Afterwards the policy is asked whether the accumulated
+    # drift warrants a full rebuild, which is then done.
+    #
+    # @param documents - List of (document identifier, text) pairs, as
+    #                    for InvertedIndex.add_document.
+    #
+    # @return True if the space was rebuilt.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def add_documents(self, documents):
+        self._check_index()
+
+        documents = list(documents)
+        if not documents:
+            return False
+
+        counts = [self.I.add_document(d) for d in documents]
+        self.docs.extend(d[0] for d in documents)
+
+        if self.update_policy.method == 'update':
+            self._update_documents(counts)
+            self._compute_derived()
+        else:
+            # T and S are unchanged, so are the term vectors and caches
+            self._fold_in_documents(counts)
+
+        if self.update_policy.needs_rebuild(self.drift()):
+            self.build()
+            return True
+
+        return False
+
+    # Adding documents or rebuilding needs the index the space was built
+    # from, a space loaded without it would be rebuilt from an empty index
+    def _check_index(self):
+        if not self.has_index:
+            raise ValueError("The semantic space was loaded without its InvertedIndex, pass I to "
+                             "SemanticSpace.load to add documents or rebuild it")
+
+    # Folds in new documents, only terms known to the space are used
+    def _fold_in_documents(self, counts):
+        C = self._count_matrix(counts, add_terms=False)
+
+        residuals = incremental.projection_residuals(self.T, C)
+        self.folded_residual += float(np.sum(residuals))
+        self.folded_docs += len(counts)
+
+        total = sum(sum(c.values()) for c in counts)
+        self.folded_terms += total
+        self.unknown_terms += total - int(C.sum())
+
+        # d^T T S^{-1} for every new document, appended as columns of Dt,
+        # and its normalized document vector
+        folded = self.fold_in_queries(C.T.tocsr())
+        k = self.max_dimension
+        self.Dt = self._append_rows('_dt_rows', self.Dt, folded, transpose=True)
+        self.doc_vectors = self._append_rows('_doc_rows', self.doc_vectors,
+                                             normalize_rows(folded[:, :k] * self.S[:k]))
+
+    ##
+    # Appends rows to an array without copying it.  The rows are kept in
+    # a buffer with spare capacity, doubled when full, so appending costs
+    # the new rows only.  A new buffer is started (one copy) whenever the
+    # array is not the one last returned for the buffer, e.g. after a
+    # rebuild or a load.
+    #
+    # @param name      - Attribute holding (array returned, buffer).
+    # @param current   - Array to append to.
+    # @param rows      - Rows to append, cast to the array's dtype.
+    # @param transpose - Append columns of current (e.g. Dt) instead.
+    #
+    # @return The array with the rows appended, a view of the buffer.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def _append_rows(self, name, current, rows, transpose=False):
+        held, buffer = getattr(self, name, None) or (None, None)
+        base = current.T if transpose else current
+        n = len(base)
+        if current is not held or len(buffer) < n + len(rows):
+            buffer = np.empty((max(2 * (n + len(rows)), 64),) + base.shape[1:], dtype=base.dtype)
+            buffer[:n] = base
+        buffer[n:n + len(rows)] = rows
+
+        result = buffer[:n + len(rows)].T if transpose else buffer[:n + len(rows)]
+        setattr(self, name, (result, buffer))
+
+        return result
+
+    # Brand update with the new documents, new terms become new rows of T
+    def _update_documents(self, counts):
+        C = self._count_matrix(counts, add_terms=True)
+
+        self.T, self.S, self.Dt = incremental.svd_update(self.T, self.S, self.Dt, C, self.max_dimension)
+        self.updated_docs += len(counts)
+
+    # Builds a sparse term by document matrix from term frequency dictionaries
+    def _count_matrix(self, counts, add_terms):
+        rows = []
+        cols = []
+        data = []
+        for j, c in enumerate(counts):
+            for t, tf in c.items():
+                i = self.term_index.get(t)
+                if i is None and add_terms:
+                    i = len(self.terms)
+                    self.term_index[t] = i
+                    self.terms.append(t)
+                if i is not None:
+                    rows.append(i)
+                    cols.append(j)
+                    data.append(tf)
+
+        return sparse.csc_matrix((np.asarray(data, dtype=np.float64), (rows, cols)),
+                                 shape=(len(self.terms), len(counts)))
+
+    ##
+    # Reports how far the space has drifted from the collection since
+    # the last full decomposition.
+    #
+    # @return Dictionary with
+    #         documents          - documents in the space
+    #         added              - documents added since the last build
+    #         folded, updated    - of which folded in / SVD updated
+    #         added_fraction     - added / documents
+    #         residual_increase  - mean relative residual of the folded in
+    #                              documents minus that of the original ones
+    #         unknown_fraction   - fraction of folded in term occurrences
+    #                              of terms the space does not know
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def drift(self):
+        added = self.folded_docs + self.updated_docs
+        documents = len(self.docs)
+
+        residual_increase = 0.0
+        if self.folded_docs:
+            residual_increase = self.folded_residual / self.folded_docs - self.base_residual
+
+        return {
+            'documents': documents,
+            'added': added,
+            'folded': self.folded_docs,
+            'updated': self.updated_docs,
+            'added_fraction': added / documents if documents else 0.0,
+            'residual_increase': residual_increase,
+            'unknown_fraction': self.unknown_terms / self.folded_terms if self.folded_terms else 0.0,
+        }
+
+    ##
+    # Saves the semantic space to a directory (see storage.py): the
+    # factors T, S and Dt, the normalized term and document vectors, the
+    # terms and documents of the space and its settings.
+    #
+    # The inverted index and A are not saved, save the index separately
+    # if the space needs to be updated or rebuilt after loading.
+    #
+    # @param path - Directory to write to, created if needed.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def save(self, path):
+        policy = self.update_policy
+        storage.write_manifest(path, "semantic_space", {
+            "max_dimension": self.max_dimension,
+            "svd": self.svd if isinstance(self.svd, str) else "auto",
+            "svd_options": self.svd_options,
+            "compact": self.compact,
+            "doc_dtype": self.doc_dtype,
+            "analyzer": self.I.analyzer.config(),
+            "update_policy": {
+                "method": policy.method,
+                "max_added_fraction": policy.max_added_fraction,
+                "max_residual_increase": policy.max_residual_increase,
+                "max_unknown_fraction": policy.max_unknown_fraction,
+            },
+            "drift": {
+                "base_docs": self.base_docs,
+                "base_residual": self.base_residual,
+                "folded_docs": self.folded_docs,
+                "updated_docs": self.updated_docs,
+                "folded_residual": self.folded_residual,
+                "folded_terms": self.folded_terms,
+                "unknown_terms": self.unknown_terms,
+            },
+        })
+        storage.save_strings(path, "terms", self.terms)
+        storage.save_strings(path, "docs", self.docs)
+        for name in ("T", "S", "Dt", "term_vectors", "doc_vectors"):
+            storage.save_array(path, name, getattr(self, name))
+
+    ##
+    # Loads a semantic space written by save.
+    #
+    # Nothing is recomputed, so loading costs little more than reading
+    # the terms and documents lists.  With mmap=True the matrices are
+    # memory mapped read-only and their pages are shared between all
+    # processes that load the same directory.
+    #
+    # @param path - Directory to read from.
+    # @param I    - InvertedIndex the space was built from.  Only needed
+    #               to add documents or rebuild (both raise ValueError
+    #               without it), an empty index (used for its text
+    #               processing, with the saved analyzer settings) is
+    #               created if not given.
+    # @param mmap - Memory map the matrices rather than read them in.
+    # @param query_cache_size, term_cache_size - As for the constructor.
+    # @param query_only - Only load what folding in queries needs (the
+    #               terms, T and S), see query_space.
+    #
+    # @return SemanticSpace object.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    @classmethod
+    def load(cls, path, I=None, mmap=True, query_cache_size=4096, term_cache_size=65536, query_only=False):
+        manifest = storage.read_manifest(path, "semantic_space")
+
+        ss = cls.__new__(cls)
+        ss.I = I if I is not None else InvertedIndex(analyzer=Analyzer.from_config(manifest.get("analyzer")))
+        ss.has_index = I is not None
+        ss.A = None
+        ss.max_dimension = manifest["max_dimension"]
+        ss.svd = manifest["svd"]
+        ss.svd_options = manifest["svd_options"]
+        ss.compact = manifest.get("compact", False)
+        ss.doc_dtype = manifest.get("doc_dtype", "float32")
+        ss.update_policy = incremental.UpdatePolicy(**manifest["update_policy"])
+        for name, value in manifest["drift"].items():
+            setattr(ss, name, value)
+
+        ss.terms = storage.load_strings(path, "terms")
+        ss.term_index = {t: i for i, t in enumerate(ss.terms)}
+        ss.docs = None if query_only else storage.load_strings(path, "docs")
+        for name in ("T", "S", "Dt", "term_vectors", "doc_vectors"):
+            loaded = not query_only or name in ("T", "S")
+            setattr(ss, name, storage.load_array(path, name, mmap) if loaded else None)
+
+        ss._compute_scales()
+
+        ss.query_cache = LRUCache(query_cache_size)
+        ss.term_cache = LRUCache(term_cache_size)
+
+        return ss
+
+    ##
+    # Copy of the space holding only what folding in queries needs: the
+    # terms, T, S and the index's text processing.  The documents (names,
+    # Dt and document vectors), the term vectors and the index itself are
+    # left out, e.g. for a coordinator whose documents are held by shards.
+    # query_vectors and fold_in_queries work on the copy, anything that
+    # touches documents does not.
+    #
+    # @return SemanticSpace object.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def query_space(self):
+        ss = copy.copy(self)
+        ss.I = InvertedIndex(analyzer=self.I.analyzer)
+        ss.has_index = False
+        ss.A = None
+        ss.docs = None
+        ss.Dt = None
+        ss.term_vectors = None
+        ss.doc_vectors = None
+        ss._dt_rows = None
+        ss._doc_rows = None
+        ss.query_cache = LRUCache(self.query_cache.maxsize)
+        ss.term_cache = LRUCache(self.term_cache.maxsize)
+
+        return ss
 
     ##
     # Create a query vector from a string of text representing the
@@ -69,30 +530,45 @@ class SemanticSpace:
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 09/10/2019 - Created (CJL).
+    # 18/10/2026 - Built from the query and term vector caches.
     ###
     def create_query_vector(self, q):
-        ret_q = [0.0 for i in range(self.I.get_total_terms())]
+        return self._folded_query(q).tolist()
 
+    ##
+    # Folds in a query string, using the caches.
+    #
+    # Rather than a dense total_terms query vector, the query is reduced
+    # to its bag of terms (row, term frequency).  If that bag has been
+    # seen before its folded vector is returned from the query cache,
+    # otherwise it is the sum of the (cached) folded term vectors, as
+    # q^T T S^{-1} is linear in q.
+    #
+    # @param q - String representing query.
+    #
+    # @return NumPy vector of the folded in query.  Do not modify it, it
+    #         may be shared with the cache.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def _folded_query(self, q):
         # This is where we ensure the query text is tokenized and processed
         # the same as the text was in the Inverted Index (we use the same
         # function call).  It's important any terms we introduce as a query
         # are in the same format as what can be found in the semantic space
         # (if they are there at all).
-        q = self.I.process_text(q)
-
-        # TODO:  Fill in the rest of this method.
-        # You will need to:
-        #    A) create a query vector (simple vector representing
-        #       the TF of each of the terms present in the query (processed
-        #       above).
-        #    B) Complete the "fold_in_query" method
-
-        # Now create a query vector
-        for t in q:
-            item = self.I.search_for_term(t)
-
-            if item[0] is not None:
-                ret_q[item[1]] += 1
+        bag = {}
+        with instrumentation.stage('query.tokenize'):
+            terms = self.I.process_text(q)
+            for t in terms:
+                i = self.term_index.get(t)
+                if i is not None:
+                    bag[i] = bag.get(i, 0) + 1
+        instrumentation.count('query.queries')
+        instrumentation.count('query.terms', len(bag))
+        instrumentation.count('query.unknown_terms', len(terms) - sum(bag.values()))
 
         ##
         # If our semantic space was generated from an initial weighted A matrix
@@ -100,9 +576,23 @@ class SemanticSpace:
         # do that here.
         ##
 
-        ret_q = self.fold_in_query(ret_q)
+        key = tuple(sorted(bag.items()))
+        folded = self.query_cache.get(key)
+        if folded is not None:
+            return folded
+
+        with instrumentation.stage('query.fold_in'):
+            folded = np.zeros(self.T.shape[1])
+            for i, tf in key:
+                term = self.term_cache.get(i)
+                if term is None:
+                    term = self.T[i] * np.asarray(self.S_inv)
+                    self.term_cache.put(i, term)
+                folded += tf * term
 
-        return ret_q
+        self.query_cache.put(key, folded)
+
+        return folded
 
     ##
     # This function takes a vector representation of a document or query
@@ -162,18 +652,197 @@ class SemanticSpace:
     # 09/10/2019 - Created (CJL).
     ###
     def cosine_with_doc(self, q, doc):
-        # Can you optimise this further using the S_sq array generated
-        # in the constructor?
-        doc = self.Dt[:, doc][:self.max_dimension]
-        q = np.array(q)[:self.max_dimension]
-
-        # TODO:  Complete this method
-        for i in range(self.max_dimension):
-            q *= self.S[i]
-            doc *= self.S[i]
+        # Scale both vectors by S elementwise.  These are copies, Dt is
+        # left untouched.
+        doc = self.Dt[:self.max_dimension, doc] * self.S[:self.max_dimension]
+        q = np.asarray(q)[:self.max_dimension] * self.S[:self.max_dimension]
 
         return np.dot(q, doc) / (np.linalg.norm(q) * np.linalg.norm(doc))
 
+    ##
+    # Converts a batch of query strings into a sparse query by term
+    # matrix of term frequencies (the vectorized equivalent of the first
+    # half of create_query_vector).
+    #
+    # @param queries - List of query strings.
+    #
+    # @return scipy.sparse CSR matrix with one row per query and one
+    #         column per term (row of T).
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def query_term_matrix(self, queries):
+        indptr = [0]
+        indices = []
+        for q in queries:
+            for t in self.I.process_text(q):
+                i = self.term_index.get(t)
+                if i is not None:
+                    indices.append(i)
+            indptr.append(len(indices))
+
+        # Duplicate term entries are summed, giving term frequencies
+        Q = sparse.csr_matrix((np.ones(len(indices)), indices, indptr),
+                              shape=(len(queries), self.T.shape[0]))
+        Q.sum_duplicates()
+
+        return Q
+
+    ##
+    # Folds a batch of queries into the semantic space with one matrix
+    # multiply, the batch version of fold_in_query.
+    #
+    # @param queries - List of query strings, or a (sparse or dense)
+    #                  query by term matrix.
+    #
+    # @return NumPy array with one folded in query (q^T T S^{-1}) per row.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def fold_in_queries(self, queries):
+        if isinstance(queries, str):
+            queries = [queries]
+        if not (sparse.issparse(queries) or isinstance(queries, np.ndarray)):
+            # Query strings go through the caches
+            if not queries:
+                return np.empty((0, self.T.shape[1]))
+            return np.vstack([self._folded_query(q) for q in queries])
+
+        return np.asarray(queries @ self.T) * np.asarray(self.S_inv)
+
+    ##
+    # Cosine between every query of a batch and every document.
+    #
+    # Folding in multiplies by S^{-1} and the cosine scales by S again,
+    # so a query's scaled vector is simply q^T T.  It is normalized and
+    # multiplied against the prenormalized document vectors.
+    #
+    # @param queries - List of query strings, a query by term matrix or,
+    #                  with folded=True, already folded in query vectors.
+    # @param folded  - True if queries are folded in vectors (as returned
+    #                  by create_query_vector).
+    # @param candidates - Optional array of document ordinals of the
+    #                  space's InvertedIndex to score, e.g. the result of
+    #                  a BooleanQuery pre-filter (columns of the space if
+    #                  it was loaded without its index).  All documents
+    #                  are scored if None.
+    #
+    # @return NumPy array of shape (queries, documents) of cosines, or
+    #         (queries, candidates) if candidates are given.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    # 18/10/2026 - Optional candidate documents.
+    # 18/10/2026 - Candidates are index ordinals.
+    ###
+    def score_documents(self, queries, folded=False, candidates=None):
+        docs = self.doc_vectors if candidates is None else self.doc_vectors[self._columns(candidates)]
+        if docs.dtype == np.float16:
+            # There is no half precision matrix multiply, score in single
+            docs = docs.astype(np.float32)
+        Q = self.query_vectors(queries, folded).astype(docs.dtype, copy=False)
+
+        with instrumentation.stage('query.score'):
+            scores = Q @ docs.T
+        instrumentation.count('query.documents_scored', scores.size)
+
+        return scores
+
+    ##
+    # Columns of the space for document ordinals of its InvertedIndex.
+    #
+    # The two only agree until documents are added to the index outside
+    # the space or the index renumbers its documents when finalized, so
+    # ordinals are matched to columns by document identifier.  The
+    # mapping is rebuilt when the index's generation or either number of
+    # documents changes.
+    #
+    # @param ordinals - Array of document ordinals of self.I.
+    #
+    # @return NumPy array of the matching columns.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def _columns(self, ordinals):
+        ordinals = np.asarray(ordinals, dtype=np.intp)
+        if not self.has_index:
+            return ordinals
+
+        key = (self.I.generation, self.I.get_total_docs(), len(self.docs))
+        if getattr(self, '_column_key', None) != key:
+            if self.I.docs == self.docs:
+                self._column_map = None
+            else:
+                column = {d: j for j, d in enumerate(self.docs)}
+                self._column_map = np.array([column.get(d, -1) for d in self.I.docs], dtype=np.intp)
+            self._column_key = key
+
+        if self._column_map is None:
+            return ordinals
+
+        columns = self._column_map[ordinals]
+        if (columns < 0).any():
+            raise ValueError("Candidate documents are not in the semantic space, add them with add_documents")
+
+        return columns
+
+    ##
+    # Folds in a batch of queries, scales them by S and normalizes them,
+    # the form compared against doc_vectors (e.g. by the ann indexes).
+    #
+    # @param queries - As for score_documents.
+    # @param folded  - As for score_documents.
+    #
+    # @return NumPy array (queries, max_dimension) of unit length vectors.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def query_vectors(self, queries, folded=False):
+        k = self.max_dimension
+        if not folded:
+            queries = self.fold_in_queries(queries)
+        Q = np.atleast_2d(np.asarray(queries, dtype=np.float64))[:, :k] * self.S[:k]
+
+        return normalize_rows(Q)
+
+    ##
+    # Ranks the documents for a batch of queries.
+    #
+    # @param queries - As for score_documents.
+    # @param top_k   - Number of documents to return per query.
+    # @param folded  - As for score_documents.
+    # @param candidates - As for score_documents, only these documents are
+    #                  ranked.
+    #
+    # @return ids    - NumPy array (queries, top_k) of document indices
+    #                  (columns of Dt, positions in self.docs), best
+    #                  first.  With candidates, the candidate ordinals.
+    #         scores - NumPy array (queries, top_k) of the matching cosines.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    # 18/10/2026 - Optional candidate documents.
+    ###
+    def rank_documents(self, queries, top_k=10, folded=False, candidates=None):
+        scores = self.score_documents(queries, folded, candidates)
+        with instrumentation.stage('query.rank'):
+            ids, top = top_k_rows(scores, top_k)
+
+        if candidates is not None:
+            ids = np.asarray(candidates)[ids]
+
+        return ids, top
+
     ##
     # Calculates the cosine between two terms in our semantic space.
     #
@@ -185,23 +854,127 @@ class SemanticSpace:
     # Revision History:
     # ~~~~~~~~~~~~~~~~~
     # 09/10/2019 - Created (CJL).
+    # 18/10/2026 - Uses the precomputed term vectors.
     ###
     def cosine_with_term(self, t1, t2):
-        t1_matx = self.T[t1][:self.max_dimension]
-        t2_matx = self.T[t2][:self.max_dimension]
+        # This is the dot product of t1*S [dot] t2*S over their magnitudes,
+        # the normalization was done once in the constructor
+        return np.dot(self.term_vectors[t1], self.term_vectors[t2])
+
+    ##
+    # Computes the cosine between every pair of terms one block of rows
+    # at a time, so memory is bounded by block_size X total_terms floats
+    # rather than total_terms squared.
+    #
+    # @param block_size - Number of terms (rows) per block.
+    #
+    # @return Generator of (start, block) pairs where block[i][j] is the
+    #         cosine between term start + i and term j.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def term_similarity_blocks(self, block_size=1024):
+        for start in range(0, self.term_vectors.shape[0], block_size):
+            yield start, self.term_vectors[start:start + block_size] @ self.term_vectors.T
+
+    ##
+    # Finds the top_k most similar terms of every term, built from
+    # term_similarity_blocks so memory stays bounded.
+    #
+    # @param top_k      - Number of neighbours per term.
+    # @param block_size - Number of terms per block.
+    #
+    # @return ids, scores - NumPy arrays (total_terms, top_k) of term
+    #                       indices and cosines, best first.  A term is
+    #                       not its own neighbour.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def term_neighbours(self, top_k=10, block_size=1024):
+        ids = []
+        scores = []
+        for start, block in self.term_similarity_blocks(block_size):
+            rows = np.arange(block.shape[0])
+            block[rows, start + rows] = -np.inf
+            block_ids, block_scores = top_k_rows(block, top_k)
+            ids.append(block_ids)
+            scores.append(block_scores)
+
+        if not ids:
+            return np.empty((0, 0), dtype=np.intp), np.empty((0, 0))
+
+        return np.vstack(ids), np.vstack(scores)
+
+    ##
+    # Looks up the terms most similar to a given term.
+    #
+    # @param term  - The term, either the word itself or its index (row).
+    # @param top_k - Number of similar terms to return.
+    #
+    # @return List of (word, cosine) pairs, best first, excluding the term
+    #         itself.  Empty if the term is not in the semantic space.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def similar_terms(self, term, top_k=10):
+        i = self.term_index.get(term) if isinstance(term, str) else term
+        if i is None or i >= self.term_vectors.shape[0]:
+            return []
+
+        scores = self.term_vectors @ self.term_vectors[i]
+        scores[i] = -np.inf
+        ids, top = top_k_rows(scores[np.newaxis, :], top_k)
 
-        for i in range(self.max_dimension):
-            t1_matx *= self.S[i]
-            t2_matx *= self.S[i]
+        return [(self.terms[j], top[0][n]) for n, j in enumerate(ids[0])]
 
-        # m_t1 and m_t2 are the magnitudes of the term vectors
-        m_t1 = np.linalg.norm(t1_matx)
-        m_t2 = np.linalg.norm(t2_matx)
 
-        # This would be the dot product of t1*S [dot] t2*S
-        calc = np.dot(t1_matx, t2_matx)
+##
+# Scales every row of a matrix to unit length.  All zero rows (e.g. a
+# query without any known terms) are left as zeros.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def normalize_rows(M):
+    M = np.atleast_2d(np.asarray(M, dtype=np.float64))
+    norms = np.linalg.norm(M, axis=1, keepdims=True)
+
+    return np.divide(M, norms, out=np.zeros_like(M), where=norms > 0)
+
+
+##
+# Selects the top k entries of each row of a score matrix without
+# sorting whole rows: argpartition picks the k best, then only those
+# are sorted.
+#
+# @param scores - NumPy array (rows, columns).
+# @param top_k  - Number of entries to select per row.
+#
+# @return ids, scores - NumPy arrays (rows, top_k), best first.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def top_k_rows(scores, top_k):
+    top_k = min(top_k, scores.shape[1])
+    if top_k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.intp), empty
+
+    if top_k < scores.shape[1]:
+        ids = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        ids = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top = np.take_along_axis(scores, ids, axis=1)
 
-        # Calculate the cosine similarity between terms
-        cos = calc / (m_t1 * m_t2)
+    order = np.argsort(-top, axis=1, kind='stable')
 
-        return cos
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(top, order, axis=1)
@@ -0,0 +1,246 @@
+##
+# asyncio query front end with micro-batching.
+#
+# Concurrent callers of QueryServer.search do not each fold in and score
+# their own query.  Queries are queued and a single batching task takes
+# the first waiting query plus every query arriving within the next
+# `window` seconds (at most max_batch in all).  The batch is folded in
+# with one sparse matrix multiply, scored with one dense matrix multiply
+# against the document vectors (SemanticSpace.rank_documents on the
+# query by term matrix) in a worker thread, and each caller's future is
+# resolved with its own top-k.  NumPy releases the GIL in the matrix
+# multiplies, so the event loop keeps accepting queries meanwhile.
+#
+# load_test / load_curve drive a server with a number of concurrent
+# clients and report throughput and latency, e.g.
+#
+#   python server.py --docs 20000 --concurrency 1,8,64 --window 0.002
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class QueryServer:
+    ##
+    # Constructor
+    #
+    # @param ss        - SemanticSpace to query.
+    # @param window    - Seconds to wait for more queries after the first
+    #                    query of a batch arrives.  0 batches only what is
+    #                    already queued.
+    # @param max_batch - Most queries scored together.
+    # @param top_k     - Default number of documents per query.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, ss, window=0.002, max_batch=64, top_k=10):
+        self.ss = ss
+        self.window = window
+        self.max_batch = max_batch
+        self.top_k = top_k
+
+        self.queue = None
+        self.task = None
+        self.executor = None
+
+        # Number of batches scored and queries answered
+        self.batches = 0
+        self.queries = 0
+
+    # Starts the batching task, call from within the event loop
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    # Stops the batching task, queries still queued are cancelled
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        while self.queue is not None and not self.queue.empty():
+            self.queue.get_nowait()[2].cancel()
+        if self.executor is not None:
+            # Waiting for a batch still being scored would block the loop
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.queue = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    ##
+    # Ranks the documents for a query.
+    #
+    # @param query - Query string.
+    # @param top_k - Number of documents, the server default if None.
+    #
+    # @return ids, scores - NumPy arrays of document ordinals and cosines,
+    #                       best first.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    async def search(self, query, top_k=None):
+        if self.task is None:
+            raise RuntimeError("QueryServer not started, call start() or use it as an async context manager")
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, top_k or self.top_k, future))
+
+        return await future
+
+    # Same as search, but returns (document identifier, score) pairs
+    async def documents(self, query, top_k=None):
+        ids, scores = await self.search(query, top_k)
+
+        return [(self.ss.docs[d], s) for d, s in zip(ids, scores)]
+
+    # Batching task: collects a batch, scores it and resolves the futures
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                deadline = loop.time() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    try:
+                        if remaining > 0:
+                            batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                        else:
+                            batch.append(self.queue.get_nowait())
+                    except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                        break
+
+                # Callers that gave up are dropped before scoring
+                batch = [item for item in batch if not item[2].done()]
+                if not batch:
+                    continue
+
+                try:
+                    ids, scores = await loop.run_in_executor(self.executor, self._score, batch)
+                except Exception as ex:
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(ex)
+                    continue
+
+                for n, (_, top_k, future) in enumerate(batch):
+                    if not future.done():
+                        future.set_result((ids[n, :top_k], scores[n, :top_k]))
+
+                self.batches += 1
+                self.queries += len(batch)
+        finally:
+            # Stopped by close: the batch being collected or scored is
+            # cancelled like the queries still queued
+            for _, _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    # Folds in and ranks a batch with matrix multiplies (worker thread)
+    def _score(self, batch):
+        Q = self.ss.query_term_matrix([query for query, _, _ in batch])
+
+        return self.ss.rank_documents(Q, max(top_k for _, top_k, _ in batch))
+
+
+##
+# Runs concurrent clients against a server.
+#
+# @param server      - Started QueryServer.
+# @param queries     - List of query strings, used round robin.
+# @param concurrency - Number of concurrent clients.
+# @param requests    - Total number of queries sent.
+#
+# @return Dictionary with the throughput (queries per second), the mean
+#         and 50/90/99th percentile latencies in seconds and the mean
+#         batch size.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+async def load_test(server, queries, concurrency, requests):
+    latencies = []
+    sent = iter(range(requests))
+    batches, answered = server.batches, server.queries
+
+    async def client():
+        for n in sent:
+            start = time.perf_counter()
+            await server.search(queries[n % len(queries)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'queries_per_s': len(latencies) / elapsed,
+        'mean_s': float(np.mean(latencies)),
+        'p50_s': float(np.percentile(latencies, 50)),
+        'p90_s': float(np.percentile(latencies, 90)),
+        'p99_s': float(np.percentile(latencies, 99)),
+        'mean_batch': (server.queries - answered) / max(server.batches - batches, 1),
+    }
+
+
+# Runs load_test at every concurrency level against a new server
+def load_curve(ss, queries, concurrencies=(1, 4, 16, 64), requests=2000, window=0.002, max_batch=64, top_k=10):
+    async def run():
+        async with QueryServer(ss, window, max_batch, top_k) as server:
+            return [await load_test(server, queries, c, requests) for c in concurrencies]
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    from benchmark import zipf_corpus
+    from inverted_index import InvertedIndex
+    from semantic_space import SemanticSpace
+
+    parser = argparse.ArgumentParser(description="Measures query throughput and latency of the micro-batching "
+                                                 "server on a synthetic corpus.")
+    parser.add_argument("--docs", type=int, default=20000, help="Number of documents.")
+    parser.add_argument("--k", type=int, default=100, help="Dimension of the semantic space.")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma separated numbers of clients.")
+    parser.add_argument("--requests", type=int, default=2000, help="Queries sent per concurrency level.")
+    parser.add_argument("--window", type=float, default=0.002, help="Batching window in seconds.")
+    parser.add_argument("--max-batch", type=int, default=64, help="Most queries per batch.")
+    args = parser.parse_args()
+
+    index = InvertedIndex()
+    for document in zipf_corpus(args.docs):
+        index.add_document(document)
+    space = SemanticSpace(index, max_dimension=args.k)
+    sample = [text for _, text in zipf_corpus(1000, doc_length=4, seed=1)]
+
+    for result in load_curve(space, sample, [int(c) for c in args.concurrency.split(",")], args.requests,
+                             args.window, args.max_batch):
+        print("{concurrency:>5} clients  {queries_per_s:9.1f} q/s  mean {mean_s:.4f}s  p50 {p50_s:.4f}s  "
+              "p99 {p99_s:.4f}s  batch {mean_batch:.1f}".format(**result))
@@ -0,0 +1,215 @@
+##
+# Sharded serving of a semantic space.
+#
+# The documents of a SemanticSpace are partitioned over n shards.  Each
+# shard is saved to its own directory (its document vectors, identifiers
+# and global ordinals, see storage.py) and served by a worker process
+# that memory maps it.  Every shard only holds its own documents, and the
+# coordinator holds none of them: it keeps a query only copy of the space
+# (SemanticSpace.query_space - the terms, T, S and the text processing),
+# whose size depends on the vocabulary, not on the number of documents.
+# Dt is not needed for scoring and is not kept anywhere.
+#
+# Only the LSA document vectors (with their identifiers) are sharded, the
+# InvertedIndex is not: Boolean, phrase and lexical queries still run
+# against a whole index in one process.
+#
+# All shards share the global term space of the SemanticSpace (T and S):
+# the coordinator folds a batch of queries in once, broadcasts the unit
+# query vectors to every shard and merges the per shard top-k lists.
+# Since every document vector and query vector lives in the same space,
+# the scores of different shards are directly comparable and the merged
+# result is that of SemanticSpace.rank_documents (up to the order of
+# equal scores).
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import storage
+from semantic_space import SemanticSpace, top_k_rows
+
+# Shard served by this worker process, set by _load_shard
+_shard = None
+
+
+class ShardedSpace:
+    ##
+    # Constructor
+    #
+    # Writes the shards and starts one worker process per shard.
+    #
+    # @param ss        - SemanticSpace to shard, or the directory of one
+    #                    written by SemanticSpace.save (its document vectors
+    #                    are then memory mapped while the shards are
+    #                    written).  The coordinator only keeps its query
+    #                    folding (terms, T and S), so the caller can drop
+    #                    the full space once the shards are written.
+    # @param n_shards  - Number of shards, defaults to the number of CPUs.
+    # @param path      - Directory for the shards, a temporary directory
+    #                    (removed by close) if not given.
+    # @param processes - If False the shards are loaded (memory mapped)
+    #                    into this process and searched one after the
+    #                    other.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def __init__(self, ss, n_shards=None, path=None, processes=True):
+        space = SemanticSpace.load(ss) if isinstance(ss, str) else ss
+        total_docs = len(space.docs)
+        self.n_shards = max(1, min(n_shards or os.cpu_count() or 1, max(total_docs, 1)))
+
+        self.cleanup = path is None
+        self.path = tempfile.mkdtemp(prefix="shards-") if path is None else path
+
+        # Contiguous ranges of document ordinals
+        bounds = np.linspace(0, total_docs, self.n_shards + 1).astype(np.int64)
+        self.shard_paths = []
+        for s in range(self.n_shards):
+            shard_path = os.path.join(self.path, "shard-{0:04d}".format(s))
+            write_shard(shard_path, np.arange(bounds[s], bounds[s + 1], dtype=np.int64),
+                        space.doc_vectors[bounds[s]:bounds[s + 1]], space.docs[bounds[s]:bounds[s + 1]])
+            self.shard_paths.append(shard_path)
+
+        self.ss = SemanticSpace.load(ss, query_only=True) if isinstance(ss, str) else ss.query_space()
+
+        # One single process pool per shard, so each shard stays loaded in
+        # its own worker
+        self.workers = [ProcessPoolExecutor(max_workers=1, initializer=_load_shard, initargs=(p,))
+                        for p in self.shard_paths] if processes else None
+        self.shards = None if processes else [read_shard(p) for p in self.shard_paths]
+
+    ##
+    # Ranks the documents of every shard for a batch of queries.
+    #
+    # @param queries - As for SemanticSpace.rank_documents.
+    # @param top_k   - Number of documents to return per query.
+    # @param folded  - As for SemanticSpace.rank_documents.
+    #
+    # @return ids, scores - NumPy arrays (queries, top_k) of global
+    #                       document ordinals and cosines, best first.
+    #
+    # Revision History:
+    # ~~~~~~~~~~~~~~~~~
+    # 18/10/2026 - Created.
+    ###
+    def rank_documents(self, queries, top_k=10, folded=False):
+        return self._rank(queries, top_k, folded, False)
+
+    # Same as rank_documents for one query, returns (document, score) pairs
+    def documents(self, query, top_k=10):
+        _, scores, names = self._rank([query], top_k, False, True)
+
+        return list(zip(names[0].tolist(), scores[0]))
+
+    # Searches every shard and merges the results, see search_shard
+    def _rank(self, queries, top_k, folded, names):
+        Q = self.ss.query_vectors(queries, folded)
+
+        if self.workers is None:
+            results = [search_shard(shard, Q, top_k, names) for shard in self.shards]
+        else:
+            futures = [w.submit(_search_loaded_shard, Q, top_k, names) for w in self.workers]
+            results = [f.result() for f in futures]
+
+        return merge_top_k(results, top_k)
+
+    # Stops the workers and removes a temporary shard directory
+    def close(self):
+        for w in self.workers or ():
+            w.shutdown()
+        self.workers = None
+        self.shards = None
+        if self.cleanup:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# Saves the document vectors of a shard, their global ordinals and the
+# document identifiers
+def write_shard(path, doc_ids, doc_vectors, docs):
+    storage.write_manifest(path, "shard", {"docs": len(doc_ids)})
+    storage.save_array(path, "doc_ids", doc_ids)
+    storage.save_array(path, "doc_vectors", doc_vectors)
+    storage.save_strings(path, "docs", docs)
+
+
+# Loads (memory maps) a shard written by write_shard, returns its
+# (doc_ids, doc_vectors, docs), docs as a NumPy object array
+def read_shard(path, mmap=True):
+    storage.read_manifest(path, "shard")
+
+    return (storage.load_array(path, "doc_ids", mmap), storage.load_array(path, "doc_vectors", mmap),
+            np.array(storage.load_strings(path, "docs"), dtype=object))
+
+
+##
+# Top-k documents of one shard.
+#
+# @param shard   - (doc_ids, doc_vectors, docs) as returned by read_shard.
+# @param Q       - NumPy array (queries, k) of unit length query vectors.
+# @param top_k   - Number of documents per query.
+# @param names   - Also return the document identifiers.
+#
+# @return ids, scores[, names] - NumPy arrays (queries, <= top_k) of
+#                       global document ordinals, cosines and (with
+#                       names) document identifiers.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def search_shard(shard, Q, top_k, names=False):
+    doc_ids, doc_vectors, docs = shard
+    ids, scores = top_k_rows(Q @ doc_vectors.T, top_k)
+
+    return (doc_ids[ids], scores, docs[ids]) if names else (doc_ids[ids], scores)
+
+
+##
+# Merges per shard top-k lists.
+#
+# @param results - List of (ids, scores[, names]) tuples as returned by
+#                  search_shard, one per shard.
+# @param top_k   - Number of documents per query.
+#
+# @return ids, scores[, names] - NumPy arrays (queries, top_k), best first.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def merge_top_k(results, top_k):
+    best, top = top_k_rows(np.hstack([r[1] for r in results]), top_k)
+    merged = [np.take_along_axis(np.hstack([r[n] for r in results]), best, axis=1)
+              for n in range(len(results[0])) if n != 1]
+    merged.insert(1, top)
+
+    return tuple(merged)
+
+
+# Worker initializer, memory maps the worker's shard
+def _load_shard(path):
+    global _shard
+    _shard = read_shard(path)
+
+
+# Worker task, searches the shard loaded by _load_shard
+def _search_loaded_shard(Q, top_k, names):
+    return search_shard(_shard, Q, top_k, names)
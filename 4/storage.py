@@ -0,0 +1,95 @@
+##
+# On-disk format shared by InvertedIndex.save and SemanticSpace.save.
+#
+# An index or space is saved as a directory containing:
+#
+#   manifest.json - format name, format version and scalar settings
+#   *.json        - lists of strings (terms, document identifiers)
+#   *.npy         - NumPy arrays, loaded with np.load(mmap_mode='r') so
+#                   several processes can map the same read-only pages
+#
+# The version is bumped whenever the layout changes; loading a directory
+# written with a different version raises a ValueError rather than
+# silently misreading it.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+
+##
+# Writes the manifest of a saved object, creating the directory.
+#
+# @param path   - Directory to write to.
+# @param kind   - Format name, e.g. "inverted_index".
+# @param fields - Dictionary of JSON serialisable settings.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def write_manifest(path, kind, fields):
+    os.makedirs(path, exist_ok=True)
+
+    manifest = {"format": kind, "version": FORMAT_VERSION}
+    manifest.update(fields)
+
+    with open(os.path.join(path, MANIFEST), 'w') as file_obj:
+        json.dump(manifest, file_obj, indent=1)
+
+
+##
+# Reads and checks the manifest of a saved object.
+#
+# @param path - Directory to read from.
+# @param kind - Expected format name.
+#
+# @return Dictionary of the manifest fields.
+#
+# Revision History:
+# ~~~~~~~~~~~~~~~~~
+# 18/10/2026 - Created.
+###
+def read_manifest(path, kind):
+    with open(os.path.join(path, MANIFEST), 'r') as file_obj:
+        manifest = json.load(file_obj)
+
+    if manifest.get("format") != kind:
+        raise ValueError(path + " does not contain a saved " + kind)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(path + " was written with format version " + str(manifest.get("version"))
+                         + ", expected " + str(FORMAT_VERSION))
+
+    return manifest
+
+
+# Saves a NumPy array as <name>.npy
+def save_array(path, name, arr):
+    np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(arr))
+
+
+# Loads <name>.npy, memory mapped read-only if mmap is True
+def load_array(path, name, mmap=True):
+    return np.load(os.path.join(path, name + ".npy"), mmap_mode='r' if mmap else None)
+
+
+# Saves a list of strings as <name>.json
+def save_strings(path, name, strings):
+    with open(os.path.join(path, name + ".json"), 'w') as file_obj:
+        json.dump(list(strings), file_obj)
+
+
+# Loads a list of strings saved by save_strings
+def load_strings(path, name):
+    with open(os.path.join(path, name + ".json"), 'r') as file_obj:
+        return json.load(file_obj)